@@ -2,7 +2,9 @@
 from .match_analysis import (
     extract_salary_from_text,
     extract_salary_from_text_regex,
+    extract_salaries_batch,
     calculate_salary_band,
+    filter_jobs,
     filter_jobs_by_domains,
     filter_jobs_by_salary
 )
@@ -10,7 +12,9 @@ from .match_analysis import (
 __all__ = [
     'extract_salary_from_text',
     'extract_salary_from_text_regex',
+    'extract_salaries_batch',
     'calculate_salary_band',
+    'filter_jobs',
     'filter_jobs_by_domains',
     'filter_jobs_by_salary'
 ]
@@ -1,10 +1,67 @@
 """Job match analysis functions including salary extraction and filtering"""
+import functools
 import json
 import re
 import streamlit as st
-import requests
 import numpy as np
-from modules.utils import get_text_generator, api_call_with_retry
+from modules.utils import get_text_generator, api_call_with_retry, _script_ctx_executor
+
+# Descriptions per batched salary request; larger batches start to cost extraction accuracy
+SALARY_BATCH_SIZE = 8
+# Salary requests in flight at once; they are independent, so batches need not wait on each other
+SALARY_MAX_CONCURRENCY = 4
+
+_SALARY_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'HKD\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*[-–—]\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)',
+    r'(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*[-–—]\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*HKD',
+    r'HKD\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*(?:per month|/month|/mth|monthly)',
+    r'(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*HKD\s*(?:per month|/month|/mth|monthly)',
+))
+
+# Strips thousands separators and expands a trailing k in one pass
+_SALARY_AMOUNT_TABLE = str.maketrans({',': '', 'k': '000', 'K': '000'})
+
+# Texts the regex cannot parse only go to the LLM if they mention pay at all
+_SALARY_HINTS = ('salary', 'hkd', '$', '/month', 'per month', 'annum', 'annual')
+
+
+def _mentions_salary(text):
+    """Whether the part of text the LLM would see contains any salary wording."""
+    window = text[:3000].lower()
+    return any(hint in window for hint in _SALARY_HINTS)
+
+
+def _salary_from_llm_fields(salary_data):
+    """Turn one LLM salary object into (min, max) monthly HKD, or (None, None) if unusable."""
+    if not isinstance(salary_data, dict) or not salary_data.get('found', False):
+        return None, None
+    min_sal = salary_data.get('min_salary_hkd_monthly')
+    max_sal = salary_data.get('max_salary_hkd_monthly')
+    try:
+        if min_sal is not None and max_sal is not None:
+            return int(min_sal), int(max_sal)
+        elif min_sal is not None:
+            return int(min_sal), int(min_sal * 1.2)
+    except (ValueError, TypeError):
+        pass
+    return None, None
+
+
+def _prepare_job_index(jobs):
+    """Cache the lowercased and truncated fields the filters read on each job dict.
+    
+    Jobs live in the session jobs cache, so this runs once per fetched job and
+    later filter passes and reruns reuse the fields. Returns jobs.
+    """
+    for job in jobs:
+        if '_desc_lower' in job:
+            continue
+        description = job.get('description', '')
+        job['_title_lower'] = job.get('title', '').lower()
+        job['_company_lower'] = job.get('company', '').lower()
+        job['_desc_lower'] = description.lower()
+        job['_desc_head'] = description[:5000]
+    return jobs
 
 
 def extract_salary_from_text(text):
@@ -12,6 +69,11 @@ def extract_salary_from_text(text):
     if not text:
         return None, None
     
+    # Plain "HKD 20,000 - 25,000" style ranges need no LLM call, nor do texts without pay wording
+    regex_result = extract_salary_from_text_regex(text)
+    if regex_result[0] is not None or not _mentions_salary(text):
+        return regex_result
+    
     text_for_extraction = text[:3000] if len(text) > 3000 else text
     
     try:
@@ -52,14 +114,9 @@ Rules:
         }
         
         def make_request():
-            return requests.post(
-                text_gen.url,
-                headers=text_gen.headers,
-                json=payload,
-                timeout=30
-            )
+            return text_gen.session.post(text_gen.url, json=payload, timeout=30)
         
-        response = api_call_with_retry(make_request, max_retries=2)
+        response = api_call_with_retry(make_request, max_retries=2, breaker=text_gen.breaker)
         
         if response and response.status_code == 200:
             result = response.json()
@@ -72,14 +129,9 @@ Rules:
                 text_gen.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
             
             try:
-                salary_data = json.loads(content)
-                if salary_data.get('found', False):
-                    min_sal = salary_data.get('min_salary_hkd_monthly')
-                    max_sal = salary_data.get('max_salary_hkd_monthly')
-                    if min_sal is not None and max_sal is not None:
-                        return int(min_sal), int(max_sal)
-                    elif min_sal is not None:
-                        return int(min_sal), int(min_sal * 1.2)
+                min_sal, max_sal = _salary_from_llm_fields(json.loads(content))
+                if min_sal is not None:
+                    return min_sal, max_sal
             except (json.JSONDecodeError, ValueError, TypeError) as e:
                 pass
         
@@ -89,25 +141,125 @@ Rules:
         return extract_salary_from_text_regex(text)
 
 
+def _request_salary_batch(text_gen, texts):
+    """Extract salaries for several texts in one completion.
+    
+    Returns (min, max) pairs aligned with texts, where (None, None) means the
+    model found no salary, or None if the request or its reply failed.
+    """
+    numbered = "\n\n".join(
+        f"[{i}] {text[:3000]}" for i, text in enumerate(texts, start=1)
+    )
+    prompt = f"""Extract salary information from each numbered job description text below.
+Look for salary ranges, amounts, and compensation details. Normalize everything to monthly HKD (Hong Kong Dollars).
+
+Return JSON with one entry per text, using the text's number as "idx":
+{{
+    "results": [
+        {{"idx": 1, "min_salary_hkd_monthly": <number or null>, "max_salary_hkd_monthly": <number or null>, "found": true/false}},
+        ...
+    ]
+}}
+
+Rules:
+- Convert all amounts to monthly HKD (multiply annual by 12, weekly by 4.33, daily by 22)
+- If only one amount is found, set both min and max to that value
+- If a range is found (e.g., "60k-80k"), extract both min and max
+- Handle formats like "competitive", "based on experience", "around 60k-80k annually" by extracting the numeric range
+- If no salary is found in a text, set "found": false and return null for min/max
+- Always return valid JSON, no additional text
+---
+{numbered}"""
+    
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a salary extraction expert. Extract salary information and normalize to monthly HKD. Return only valid JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 60 * len(texts) + 50,
+        "temperature": 0.1,
+        "response_format": {"type": "json_object"}
+    }
+    
+    def make_request():
+        return text_gen.session.post(text_gen.url, json=payload, timeout=45)
+    
+    extracted = [(None, None)] * len(texts)
+    response = api_call_with_retry(make_request, max_retries=2, breaker=text_gen.breaker)
+    if not (response and response.status_code == 200):
+        return None
+    try:
+        result = response.json()
+        content = result['choices'][0]['message']['content']
+        
+        if text_gen.token_tracker and 'usage' in result:
+            usage = result['usage']
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+            text_gen.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+        
+        for item in json.loads(content).get('results', []):
+            idx = item.get('idx') if isinstance(item, dict) else None
+            if isinstance(idx, int) and 1 <= idx <= len(texts):
+                extracted[idx - 1] = _salary_from_llm_fields(item)
+    except (json.JSONDecodeError, ValueError, TypeError, KeyError, IndexError, AttributeError):
+        return None
+    return extracted
+
+
+def extract_salaries_batch(texts, batch_size=SALARY_BATCH_SIZE):
+    """Extract (min, max) monthly HKD salaries for many texts, batch_size texts per LLM request.
+    
+    Returns a list aligned with texts. As in extract_salary_from_text, the
+    regex extractor runs first and only texts it cannot parse but that
+    mention pay are sent to the model, up to SALARY_MAX_CONCURRENCY
+    requests at a time.
+    """
+    return _extract_salaries_batch(texts, batch_size)[0]
+
+
+def _extract_salaries_batch(texts, batch_size=SALARY_BATCH_SIZE):
+    """extract_salaries_batch plus the set of indices whose model request failed"""
+    failed = set()
+    extracted = [extract_salary_from_text_regex(text) for text in texts]
+    pending = [
+        i for i, text in enumerate(texts)
+        if text and extracted[i][0] is None and _mentions_salary(text)
+    ]
+    text_gen = get_text_generator() if pending else None
+    if text_gen is not None:
+        chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        
+        def request_chunk(chunk):
+            return _request_salary_batch(text_gen, [texts[i] for i in chunk])
+        
+        if len(chunks) == 1:
+            results = [request_chunk(chunks[0])]
+        else:
+            with _script_ctx_executor(min(SALARY_MAX_CONCURRENCY, len(chunks))) as executor:
+                results = list(executor.map(request_chunk, chunks))
+        for chunk, values in zip(chunks, results):
+            if values is None:
+                failed.update(chunk)
+                continue
+            for i, value in zip(chunk, values):
+                if value[0] is not None:
+                    extracted[i] = value
+    return extracted, failed
+
+
 def extract_salary_from_text_regex(text):
     """Fallback regex-based salary extraction"""
     if not text:
         return None, None
     
-    patterns = [
-        r'HKD\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*[-–—]\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)',
-        r'(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*[-–—]\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*HKD',
-        r'HKD\s*\$?\s*(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*(?:per month|/month|/mth|monthly)',
-        r'(\d{1,3}(?:,\d{3})*(?:k|K)?)\s*HKD\s*(?:per month|/month|/mth|monthly)',
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in _SALARY_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             match = matches[0]
             if isinstance(match, tuple) and len(match) == 2:
-                min_sal = match[0].replace(',', '').replace('k', '000').replace('K', '000')
-                max_sal = match[1].replace(',', '').replace('k', '000').replace('K', '000')
+                min_sal = match[0].translate(_SALARY_AMOUNT_TABLE)
+                max_sal = match[1].translate(_SALARY_AMOUNT_TABLE)
                 try:
                     min_val = int(min_sal)
                     max_val = int(max_sal)
@@ -115,7 +267,7 @@ def extract_salary_from_text_regex(text):
                 except:
                     pass
             elif isinstance(match, tuple) and len(match) == 1:
-                sal = match[0].replace(',', '').replace('k', '000').replace('K', '000')
+                sal = match[0].translate(_SALARY_AMOUNT_TABLE)
                 try:
                     sal_val = int(sal)
                     return sal_val, int(sal_val * 1.2)
@@ -125,31 +277,101 @@ def extract_salary_from_text_regex(text):
     return None, None
 
 
+def _prepare_job_salaries(jobs):
+    """Extract each job's (min, max) salary once and cache it as _min_sal / _max_sal.
+    
+    The salary field is tried first and the description head only for jobs
+    whose field gave nothing, each pass in batched requests. The salary band
+    and the salary filter then read the cached fields.
+    
+    A job left without a salary because a model request failed is marked
+    _sal_retry, so the next call asks again instead of caching the outage.
+    """
+    jobs = [job for job in _prepare_job_index(jobs) if '_min_sal' not in job or job.get('_sal_retry')]
+    if not jobs:
+        return
+    salary_strs = [job.get('salary', '') for job in jobs]
+    salary_strs = [s if s != 'Not specified' else '' for s in salary_strs]
+    bands, failed = _extract_salaries_batch(salary_strs)
+    retry = [i for i, (min_sal, _) in enumerate(bands) if not min_sal]
+    desc_bands, desc_failed = _extract_salaries_batch([jobs[i]['_desc_head'] for i in retry])
+    for i, band in zip(retry, desc_bands):
+        bands[i] = band
+    failed.update(retry[pos] for pos in desc_failed)
+    for i, (job, (min_sal, max_sal)) in enumerate(zip(jobs, bands)):
+        job['_min_sal'], job['_max_sal'] = min_sal, max_sal
+        job['_sal_retry'] = not min_sal and i in failed
+
+
 def calculate_salary_band(matched_jobs):
     """Calculate estimated salary band from matched jobs"""
-    salaries = []
-    
-    for result in matched_jobs:
-        job = result['job']
-        salary_str = job.get('salary', '')
-        if salary_str and salary_str != 'Not specified':
-            min_sal, max_sal = extract_salary_from_text(salary_str)
-            if min_sal and max_sal:
-                salaries.append((min_sal, max_sal))
-        
-        description = job.get('description', '')
-        if description:
-            min_sal, max_sal = extract_salary_from_text(description[:5000])
-            if min_sal and max_sal:
-                salaries.append((min_sal, max_sal))
+    jobs = [result['job'] for result in matched_jobs]
+    _prepare_job_salaries(jobs)
     
-    if not salaries:
+    # One (N, 2) array of (min, max) rows; rows missing either bound are dropped
+    # and both columns are averaged in a single reduction
+    salaries = np.array(
+        [(job['_min_sal'] or 0, job['_max_sal'] or 0) for job in jobs],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    salaries = salaries[(salaries != 0).all(axis=1)]
+    
+    if not len(salaries):
         return 45000, 55000
     
-    avg_min = int(np.mean([s[0] for s in salaries]))
-    avg_max = int(np.mean([s[1] for s in salaries]))
+    avg_min, avg_max = salaries.mean(axis=0)
+    
+    return int(avg_min), int(avg_max)
+
+
+_DOMAIN_KEYWORDS = {
+    'FinTech': ['fintech', 'financial technology', 'blockchain', 'crypto', 'cryptocurrency', 'payment', 'banking technology', 'digital banking', 'wealthtech', 'insurtech'],
+    'ESG & Sustainability': ['esg', 'sustainability', 'environmental', 'green', 'carbon', 'climate', 'renewable', 'sustainable'],
+    'Data Analytics': ['data analytics', 'data analysis', 'business intelligence', 'bi', 'data science', 'data engineer', 'analytics', 'big data'],
+    'Digital Transformation': ['digital transformation', 'digitalization', 'digital strategy', 'innovation', 'digital', 'transformation'],
+    'Investment Banking': ['investment banking', 'ib', 'm&a', 'mergers', 'acquisitions', 'capital markets', 'equity research', 'corporate finance'],
+    'Consulting': ['consulting', 'consultant', 'advisory', 'strategy consulting', 'management consulting'],
+    'Technology': ['software', 'technology', 'tech', 'engineering', 'developer', 'programming', 'it', 'information technology', 'software engineer'],
+    'Healthcare': ['healthcare', 'medical', 'health', 'hospital', 'clinical', 'pharmaceutical', 'biotech'],
+    'Education': ['education', 'teaching', 'academic', 'university', 'school', 'e-learning', 'edtech'],
+    'Real Estate': ['real estate', 'property', 'realty', 'property management', 'real estate development'],
+    'Retail & E-commerce': ['retail', 'e-commerce', 'ecommerce', 'online retail', 'retail management'],
+    'Marketing & Advertising': ['marketing', 'advertising', 'brand', 'digital marketing', 'social media marketing'],
+    'Legal': ['legal', 'law', 'attorney', 'lawyer', 'compliance', 'regulatory'],
+    'Human Resources': ['human resources', 'hr', 'recruitment', 'talent acquisition', 'people operations'],
+    'Operations': ['operations', 'operations management', 'supply chain', 'logistics', 'procurement']
+}
+
+
+@functools.lru_cache(maxsize=64)
+def _domain_keywords_for(target_domains):
+    """Lowercased keywords for a tuple of domains, minus any keyword that contains another.
     
-    return avg_min, avg_max
+    A job matches when any keyword is a substring of its text, so a keyword
+    containing a shorter one ("software engineer" vs "software") can never
+    change the result and is not scanned for.
+    """
+    keywords = []
+    for domain in target_domains:
+        keywords.extend(keyword.lower() for keyword in _DOMAIN_KEYWORDS.get(domain, [domain.lower()]))
+    keywords = list(dict.fromkeys(keywords))
+    return tuple(
+        keyword for keyword in keywords
+        if not any(other != keyword and other in keyword for other in keywords)
+    )
+
+
+def _job_mentions_any(job, keywords):
+    """Whether any keyword occurs in the job's cached lowercased title, description or company."""
+    # Scan the cached fields in place rather than copying them into one string
+    title, description, company = job['_title_lower'], job['_desc_lower'], job['_company_lower']
+    return any(keyword in title or keyword in description or keyword in company for keyword in keywords)
+
+
+def _meets_salary(job, min_salary):
+    """Whether a job with an extracted salary reaches min_salary at either end of its band."""
+    min_sal, max_sal = job['_min_sal'], job['_max_sal']
+    return bool(min_sal) and (min_sal >= min_salary or bool(max_sal and max_sal >= min_salary))
 
 
 def filter_jobs_by_domains(jobs, target_domains):
@@ -157,36 +379,8 @@ def filter_jobs_by_domains(jobs, target_domains):
     if not target_domains:
         return jobs
     
-    filtered = []
-    domain_keywords = {
-        'FinTech': ['fintech', 'financial technology', 'blockchain', 'crypto', 'cryptocurrency', 'payment', 'banking technology', 'digital banking', 'wealthtech', 'insurtech'],
-        'ESG & Sustainability': ['esg', 'sustainability', 'environmental', 'green', 'carbon', 'climate', 'renewable', 'sustainable'],
-        'Data Analytics': ['data analytics', 'data analysis', 'business intelligence', 'bi', 'data science', 'data engineer', 'analytics', 'big data'],
-        'Digital Transformation': ['digital transformation', 'digitalization', 'digital strategy', 'innovation', 'digital', 'transformation'],
-        'Investment Banking': ['investment banking', 'ib', 'm&a', 'mergers', 'acquisitions', 'capital markets', 'equity research', 'corporate finance'],
-        'Consulting': ['consulting', 'consultant', 'advisory', 'strategy consulting', 'management consulting'],
-        'Technology': ['software', 'technology', 'tech', 'engineering', 'developer', 'programming', 'it', 'information technology', 'software engineer'],
-        'Healthcare': ['healthcare', 'medical', 'health', 'hospital', 'clinical', 'pharmaceutical', 'biotech'],
-        'Education': ['education', 'teaching', 'academic', 'university', 'school', 'e-learning', 'edtech'],
-        'Real Estate': ['real estate', 'property', 'realty', 'property management', 'real estate development'],
-        'Retail & E-commerce': ['retail', 'e-commerce', 'ecommerce', 'online retail', 'retail management'],
-        'Marketing & Advertising': ['marketing', 'advertising', 'brand', 'digital marketing', 'social media marketing'],
-        'Legal': ['legal', 'law', 'attorney', 'lawyer', 'compliance', 'regulatory'],
-        'Human Resources': ['human resources', 'hr', 'recruitment', 'talent acquisition', 'people operations'],
-        'Operations': ['operations', 'operations management', 'supply chain', 'logistics', 'procurement']
-    }
-    
-    for job in jobs:
-        title_lower = job.get('title', '').lower()
-        desc_lower = job.get('description', '').lower()
-        company_lower = job.get('company', '').lower()
-        combined = f"{title_lower} {desc_lower} {company_lower}"
-        
-        for domain in target_domains:
-            keywords = domain_keywords.get(domain, [domain.lower()])
-            if any(keyword.lower() in combined for keyword in keywords):
-                filtered.append(job)
-                break
+    keywords = _domain_keywords_for(tuple(target_domains))
+    filtered = [job for job in _prepare_job_index(jobs) if _job_mentions_any(job, keywords)]
     
     return filtered if filtered else jobs
 
@@ -196,27 +390,19 @@ def filter_jobs_by_salary(jobs, min_salary):
     if not min_salary or min_salary <= 0:
         return jobs
     
-    filtered = []
-    jobs_without_salary = []
-    
-    for job in jobs:
-        salary_str = job.get('salary', '')
-        description = job.get('description', '')
-        
-        min_sal, max_sal = extract_salary_from_text(salary_str)
-        
-        if not min_sal:
-            min_sal, max_sal = extract_salary_from_text(description)
-        
-        if min_sal:
-            if min_sal >= min_salary or (max_sal and max_sal >= min_salary):
-                filtered.append(job)
-        else:
-            jobs_without_salary.append(job)
-    
+    _prepare_job_salaries(jobs)
+    filtered = [job for job in jobs if _meets_salary(job, min_salary)]
     if filtered:
         return filtered
-    elif jobs_without_salary:
-        return jobs_without_salary
-    else:
-        return []
+    # Nothing qualified: fall back to the jobs whose salary is unknown
+    return [job for job in jobs if not job['_min_sal']]
+
+
+def filter_jobs(jobs, target_domains=None, min_salary=0):
+    """Apply the domain filter and then the salary filter.
+    
+    Both filters read the fields cached by _prepare_job_index and
+    _prepare_job_salaries, so each job is lowercased once, and salaries are
+    only extracted for jobs that survive the domain filter.
+    """
+    return filter_jobs_by_salary(filter_jobs_by_domains(jobs, target_domains), min_salary)
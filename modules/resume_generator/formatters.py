@@ -1,76 +1,155 @@
 """Resume formatting functions for DOCX, PDF, and text export"""
+import functools
 import streamlit as st
 from io import BytesIO
+from zipfile import ZipFile, ZIP_DEFLATED
 from docx import Document
+from docx.opc.pkgwriter import PackageWriter
+from docx.oxml import OxmlElement
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.text.paragraph import Paragraph
+
+# Deflate level for generated .docx files. A resume package is tens of KB, so
+# level 1 costs a few KB of download and saves most of the compression time.
+DOCX_COMPRESSLEVEL = 1
+
+# Header fields joined into the contact line, in display order
+_CONTACT_KEYS = ('email', 'phone', 'location', 'linkedin', 'portfolio')
+
+# Lengths and alignment shared by every generated .docx, built once
+_DOCX_MARGIN_VERTICAL = Inches(0.5)
+_DOCX_MARGIN_HORIZONTAL = Inches(0.75)
+_DOCX_NAME_SIZE = Pt(18)
+_DOCX_TITLE_SIZE = Pt(12)
+_DOCX_BODY_SIZE = Pt(11)
+_DOCX_SMALL_SIZE = Pt(10)
+_DOCX_CENTER = WD_ALIGN_PARAGRAPH.CENTER
+
+
+class _DocxZipWriter:
+    """Physical package writer for python-docx that deflates at DOCX_COMPRESSLEVEL"""
+    
+    def __init__(self, pkg_file):
+        self._zipf = ZipFile(pkg_file, "w", compression=ZIP_DEFLATED, compresslevel=DOCX_COMPRESSLEVEL)
+    
+    def write(self, pack_uri, blob):
+        self._zipf.writestr(pack_uri.membername, blob)
+    
+    def close(self):
+        self._zipf.close()
+
+
+def _save_docx(doc, stream):
+    """doc.save(stream) with the package zipped at DOCX_COMPRESSLEVEL.
+    
+    Mirrors OpcPackage.save and PackageWriter.write, which always zip at
+    zlib's default level 6. These are python-docx internals, so if a release
+    renames them the document is saved with doc.save instead.
+    """
+    try:
+        package = doc.part.package
+        parts = package.parts
+        for part in parts:
+            part.before_marshal()
+        writer = _DocxZipWriter(stream)
+        try:
+            PackageWriter._write_content_types_stream(writer, parts)
+            PackageWriter._write_pkg_rels(writer, package.rels)
+            PackageWriter._write_parts(writer, parts)
+        finally:
+            writer.close()
+    except (AttributeError, TypeError):
+        stream.seek(0)
+        stream.truncate()
+        doc.save(stream)
+
+
+@functools.lru_cache(maxsize=1)
+def _docx_template_bytes():
+    """Saved blank document with the resume margins set, built on first use"""
+    doc = Document()
+    for section in doc.sections:
+        section.top_margin = _DOCX_MARGIN_VERTICAL
+        section.bottom_margin = _DOCX_MARGIN_VERTICAL
+        section.left_margin = _DOCX_MARGIN_HORIZONTAL
+        section.right_margin = _DOCX_MARGIN_HORIZONTAL
+    template_io = BytesIO()
+    doc.save(template_io)
+    return template_io.getvalue()
+
+
+def _detached_paragraph(doc):
+    """New paragraph belonging to doc but not yet placed in its body.
+    
+    doc.add_paragraph scans the whole body for the trailing sectPr on every
+    call; paragraphs built here are appended together once the document is
+    complete. The document itself is the parent, so styles resolve through
+    doc.part without reaching into python-docx's private _body.
+    """
+    return Paragraph(OxmlElement('w:p'), doc)
 
 
 def generate_docx_from_json(resume_data, filename="resume.docx"):
-    """Generate a professional .docx file from structured resume JSON"""
+    """Generate a professional .docx file from structured resume JSON; returns the file's bytes"""
     try:
-        doc = Document()
+        doc = Document(BytesIO(_docx_template_bytes()))
+        
+        # Paragraphs are built detached and appended to the body in one go
+        paragraphs = []
         
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(0.5)
-            section.bottom_margin = Inches(0.5)
-            section.left_margin = Inches(0.75)
-            section.right_margin = Inches(0.75)
+        def add_paragraph(text='', style=None):
+            para = _detached_paragraph(doc)
+            if text:
+                para.add_run(text)
+            if style is not None:
+                para.style = style
+            paragraphs.append(para._p)
+            return para
         
         header = resume_data.get('header', {})
         if header.get('name'):
-            name_para = doc.add_paragraph()
+            name_para = add_paragraph()
             name_run = name_para.add_run(header['name'])
-            name_run.font.size = Pt(18)
+            name_run.font.size = _DOCX_NAME_SIZE
             name_run.font.bold = True
-            name_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        contact_info = []
-        if header.get('email'):
-            contact_info.append(header['email'])
-        if header.get('phone'):
-            contact_info.append(header['phone'])
-        if header.get('location'):
-            contact_info.append(header['location'])
-        if header.get('linkedin'):
-            contact_info.append(header['linkedin'])
-        if header.get('portfolio'):
-            contact_info.append(header['portfolio'])
+            name_para.alignment = _DOCX_CENTER
+        
+        contact_info = [value for key in _CONTACT_KEYS if (value := header.get(key))]
         
         if contact_info:
-            contact_para = doc.add_paragraph(' | '.join(contact_info))
-            contact_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            contact_para.runs[0].font.size = Pt(10)
+            contact_para = add_paragraph(' | '.join(contact_info))
+            contact_para.alignment = _DOCX_CENTER
+            contact_para.runs[0].font.size = _DOCX_SMALL_SIZE
         
-        doc.add_paragraph()
+        add_paragraph()
         
         if header.get('title'):
-            title_para = doc.add_paragraph(header['title'])
-            title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            title_para.runs[0].font.size = Pt(12)
+            title_para = add_paragraph(header['title'])
+            title_para.alignment = _DOCX_CENTER
+            title_para.runs[0].font.size = _DOCX_TITLE_SIZE
             title_para.runs[0].italic = True
-            doc.add_paragraph()
+            add_paragraph()
         
         if resume_data.get('summary'):
-            doc.add_heading('Professional Summary', level=2)
-            summary_para = doc.add_paragraph(resume_data['summary'])
-            summary_para.runs[0].font.size = Pt(11)
-            doc.add_paragraph()
+            add_paragraph('Professional Summary', style='Heading 2')
+            summary_para = add_paragraph(resume_data['summary'])
+            summary_para.runs[0].font.size = _DOCX_BODY_SIZE
+            add_paragraph()
         
         skills = resume_data.get('skills_highlighted', [])
         if skills:
-            doc.add_heading('Key Skills', level=2)
+            add_paragraph('Key Skills', style='Heading 2')
             skills_text = ' • '.join(skills)
-            skills_para = doc.add_paragraph(skills_text)
-            skills_para.runs[0].font.size = Pt(11)
-            doc.add_paragraph()
+            skills_para = add_paragraph(skills_text)
+            skills_para.runs[0].font.size = _DOCX_BODY_SIZE
+            add_paragraph()
         
         experience = resume_data.get('experience', [])
         if experience:
-            doc.add_heading('Professional Experience', level=2)
+            add_paragraph('Professional Experience', style='Heading 2')
             for exp in experience:
-                exp_header = doc.add_paragraph()
+                exp_header = add_paragraph()
                 exp_header.add_run(exp.get('title', '')).bold = True
                 if exp.get('company'):
                     exp_header.add_run(f" at {exp['company']}")
@@ -80,26 +159,32 @@ def generate_docx_from_json(resume_data, filename="resume.docx"):
                 bullets = exp.get('bullets', [])
                 for bullet in bullets:
                     if bullet.strip():
-                        bullet_para = doc.add_paragraph(bullet, style='List Bullet')
-                        bullet_para.runs[0].font.size = Pt(10)
+                        bullet_para = add_paragraph(bullet, style='List Bullet')
+                        bullet_para.runs[0].font.size = _DOCX_SMALL_SIZE
                 
-                doc.add_paragraph()
+                add_paragraph()
         
         if resume_data.get('education'):
-            doc.add_heading('Education', level=2)
-            edu_para = doc.add_paragraph(resume_data['education'])
-            edu_para.runs[0].font.size = Pt(11)
-            doc.add_paragraph()
+            add_paragraph('Education', style='Heading 2')
+            edu_para = add_paragraph(resume_data['education'])
+            edu_para.runs[0].font.size = _DOCX_BODY_SIZE
+            add_paragraph()
         
         if resume_data.get('certifications'):
-            doc.add_heading('Certifications & Awards', level=2)
-            cert_para = doc.add_paragraph(resume_data['certifications'])
-            cert_para.runs[0].font.size = Pt(11)
+            add_paragraph('Certifications & Awards', style='Heading 2')
+            cert_para = add_paragraph(resume_data['certifications'])
+            cert_para.runs[0].font.size = _DOCX_BODY_SIZE
+        
+        body = doc.element.body
+        sect_pr = body.sectPr
+        body.extend(paragraphs)
+        if sect_pr is not None:
+            # appending moves it back behind the new paragraphs
+            body.append(sect_pr)
         
         doc_io = BytesIO()
-        doc.save(doc_io)
-        doc_io.seek(0)
-        return doc_io
+        _save_docx(doc, doc_io)
+        return doc_io.getvalue()
         
     except Exception as e:
         st.error(f"Error generating DOCX: {e}")
@@ -107,7 +192,7 @@ def generate_docx_from_json(resume_data, filename="resume.docx"):
 
 
 def generate_pdf_from_json(resume_data, filename="resume.pdf"):
-    """Generate a professional PDF file from structured resume JSON"""
+    """Generate a professional PDF file from structured resume JSON; returns the file's bytes"""
     try:
         from reportlab.lib.pagesizes import letter
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -166,17 +251,7 @@ def generate_pdf_from_json(resume_data, filename="resume.pdf"):
             elements.append(Paragraph(header['name'], title_style))
             elements.append(Spacer(1, 0.1*inch))
         
-        contact_info = []
-        if header.get('email'):
-            contact_info.append(header['email'])
-        if header.get('phone'):
-            contact_info.append(header['phone'])
-        if header.get('location'):
-            contact_info.append(header['location'])
-        if header.get('linkedin'):
-            contact_info.append(header['linkedin'])
-        if header.get('portfolio'):
-            contact_info.append(header['portfolio'])
+        contact_info = [value for key in _CONTACT_KEYS if (value := header.get(key))]
         
         if contact_info:
             elements.append(Paragraph(' | '.join(contact_info), contact_style))
@@ -230,8 +305,7 @@ def generate_pdf_from_json(resume_data, filename="resume.pdf"):
             elements.append(Paragraph(resume_data['certifications'], normal_style))
         
         doc.build(elements)
-        pdf_io.seek(0)
-        return pdf_io
+        return pdf_io.getvalue()
         
     except Exception as e:
         st.error(f"Error generating PDF: {e}")
@@ -247,17 +321,7 @@ def format_resume_as_text(resume_data):
         text.append(header['name'].upper())
         text.append("")
     
-    contact = []
-    if header.get('email'):
-        contact.append(header['email'])
-    if header.get('phone'):
-        contact.append(header['phone'])
-    if header.get('location'):
-        contact.append(header['location'])
-    if header.get('linkedin'):
-        contact.append(header['linkedin'])
-    if header.get('portfolio'):
-        contact.append(header['portfolio'])
+    contact = [value for key in _CONTACT_KEYS if (value := header.get(key))]
     
     if contact:
         text.append(' | '.join(contact))
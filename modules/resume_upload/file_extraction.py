@@ -1,7 +1,36 @@
 """File extraction functions for resume upload"""
 import streamlit as st
-import PyPDF2
-from docx import Document
+
+# The PDF and DOCX readers are imported where they are used, so loading this
+# module (and every app start) doesn't pay for them until a resume is uploaded
+
+
+def _extract_pdf_text(uploaded_file):
+    """Text of every PDF page, each followed by a newline.
+    
+    Uses PDFium through pypdfium2 when it is installed and PyPDF2 otherwise.
+    """
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:  # optional speedup; PyPDF2 reads the same files, only slower
+        pdfium = None
+    
+    uploaded_file.seek(0)
+    if pdfium is not None:
+        try:
+            pdf = pdfium.PdfDocument(uploaded_file.read())
+            try:
+                return "".join(page.get_textpage().get_text_range() + "\n" for page in pdf)
+            finally:
+                pdf.close()
+        except Exception:
+            # PyPDF2 is more lenient with some malformed files
+            uploaded_file.seek(0)
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(uploaded_file)
+    # One join instead of re-copying the accumulated text for every page;
+    # extract_text can return None for image-only pages
+    return "".join((page.extract_text() or "") + "\n" for page in pdf_reader.pages)
 
 
 def extract_text_from_resume(uploaded_file):
@@ -10,14 +39,10 @@ def extract_text_from_resume(uploaded_file):
         file_type = uploaded_file.name.split('.')[-1].lower()
         
         if file_type == 'pdf':
-            uploaded_file.seek(0)
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            return _extract_pdf_text(uploaded_file)
         
         elif file_type == 'docx':
+            from docx import Document
             uploaded_file.seek(0)
             doc = Document(uploaded_file)
             text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
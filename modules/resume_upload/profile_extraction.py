@@ -2,9 +2,14 @@
 import json
 import re
 import streamlit as st
-import requests
-from modules.utils import get_text_generator, api_call_with_retry, _websocket_keepalive
-from modules.utils.config import ENABLE_PROFILE_PASS2
+from modules.utils import get_text_generator, api_call_with_retry, _websocket_keepalive, _submit_in_background
+from modules.utils.config import ENABLE_PROFILE_PASS2, PROFILE_PASS2_ON_DEMAND
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # optional speedup; stdlib json parses the same documents
+    _json_loads = json.loads
 
 
 def extract_relevant_resume_sections(resume_text):
@@ -91,8 +96,67 @@ def extract_relevant_resume_sections(resume_text):
     return ""
 
 
+_PROFILE_JSON_STRUCTURE = """{
+    "name": "Full name",
+    "email": "Email address",
+    "phone": "Phone number",
+    "location": "City, State/Country",
+    "linkedin": "LinkedIn URL if mentioned",
+    "portfolio": "Portfolio/website URL if mentioned",
+    "summary": "Professional summary or objective (2-3 sentences)",
+    "experience": "Work experience in chronological order with job titles, companies, dates, and key achievements (formatted as bullet points)",
+    "education": "Education details including degrees, institutions, and graduation dates",
+    "skills": "Comma-separated list of technical and soft skills",
+    "certifications": "Professional certifications, awards, publications, or other achievements"
+}"""
+
+
+_EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+
+def _profile_looks_good(profile):
+    """Cheap local check that a first-pass profile has a name, a plausible email and some experience."""
+    def present(key):
+        return str(profile.get(key) or '').strip().lower() not in ('', 'n/a')
+    return present('name') and present('experience') and bool(_EMAIL_RE.search(str(profile.get('email') or '')))
+
+
+def _read_profile_response(text_gen, response):
+    """Parse a profile pass response into a dict, recording token usage; None if unusable."""
+    if not response or response.status_code != 200:
+        return None
+    result = _json_loads(response.content)
+    content = result['choices'][0]['message']['content']
+    
+    if text_gen.token_tracker and 'usage' in result:
+        usage = result['usage']
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        text_gen.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+    
+    try:
+        return _json_loads(content)
+    except json.JSONDecodeError:
+        # Outermost {...} span by index scan, as the old greedy DOTALL regex matched
+        start, end = content.find('{'), content.rfind('}')
+        if start != -1 and end > start:
+            try:
+                return _json_loads(content[start:end + 1])
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
 def extract_profile_from_resume(resume_text):
-    """Use Azure OpenAI to extract structured profile information from resume text with two-pass self-correction"""
+    """Use Azure OpenAI to extract structured profile information from resume text with two-pass self-correction
+    
+    When ENABLE_PROFILE_PASS2 is set, the verifying pass works from the raw
+    resume text rather than from the first pass's output. With
+    PROFILE_PASS2_ON_DEMAND (the default) it only runs when the first pass
+    fails _profile_looks_good; otherwise both requests run concurrently. The
+    verified answer is preferred when it parses; otherwise the first pass is
+    used.
+    """
     try:
         text_gen = get_text_generator()
         
@@ -107,19 +171,7 @@ RESUME TEXT:
 {resume_text}
 
 Please extract and return the following information in JSON format:
-{{
-    "name": "Full name",
-    "email": "Email address",
-    "phone": "Phone number",
-    "location": "City, State/Country",
-    "linkedin": "LinkedIn URL if mentioned",
-    "portfolio": "Portfolio/website URL if mentioned",
-    "summary": "Professional summary or objective (2-3 sentences)",
-    "experience": "Work experience in chronological order with job titles, companies, dates, and key achievements (formatted as bullet points)",
-    "education": "Education details including degrees, institutions, and graduation dates",
-    "skills": "Comma-separated list of technical and soft skills",
-    "certifications": "Professional certifications, awards, publications, or other achievements"
-}}
+{_PROFILE_JSON_STRUCTURE}
 
 Important:
 - If information is not found, use "N/A" or empty string
@@ -138,19 +190,57 @@ Important:
             "response_format": {"type": "json_object"}
         }
         
+        def post_pass(payload):
+            def make_request():
+                return text_gen.session.post(text_gen.url, json=payload, timeout=45)
+            return api_call_with_retry(make_request, max_retries=3, breaker=text_gen.breaker)
+        
+        # SECOND PASS: Self-correction (optional), extracted and verified from the raw
+        # text so it does not have to wait for the first pass
+        payload_pass2 = None
+        future_pass2 = None
+        if ENABLE_PROFILE_PASS2:
+            prompt_pass2 = f"""You are a resume quality checker. Extract structured information from the resume text below, then verify every value against the text before answering, paying special attention to:
+1. **Dates** - Verify all employment dates, education dates, and certification dates are accurate
+2. **Company Names** - Verify all company/organization names are spelled correctly
+3. **Job Titles** - Verify job titles are accurate
+4. **Education Institutions** - Verify institution names are correct
+
+RESUME TEXT:
+{resume_text}
+
+Return ONLY valid JSON with this structure:
+{_PROFILE_JSON_STRUCTURE}
+
+If information is not found, use "N/A" or empty string. Return ONLY valid JSON, no additional text or markdown."""
+            
+            payload_pass2 = {
+                "messages": [
+                    {"role": "system", "content": "You are a resume quality checker. Extract structured information from the resume text and verify it against the text, especially dates and company names. Return only valid JSON."},
+                    {"role": "user", "content": prompt_pass2}
+                ],
+                "max_tokens": 2000,
+                "temperature": 0.1,
+                "response_format": {"type": "json_object"}
+            }
+            if not PROFILE_PASS2_ON_DEMAND:
+                future_pass2 = _submit_in_background(post_pass, payload_pass2)
+        
         _websocket_keepalive("Extracting profile information...")
         
-        def make_request_pass1():
-            return requests.post(
-                text_gen.url,
-                headers=text_gen.headers,
-                json=payload_pass1,
-                timeout=45
-            )
+        response_pass1 = post_pass(payload_pass1)
         
-        response_pass1 = api_call_with_retry(make_request_pass1, max_retries=3)
+        profile_data_pass2 = None
+        if future_pass2 is not None:
+            _websocket_keepalive("Verifying profile data...")
+            try:
+                profile_data_pass2 = _read_profile_response(text_gen, future_pass2.result())
+            except Exception:
+                profile_data_pass2 = None
         
         if not response_pass1 or response_pass1.status_code != 200:
+            if profile_data_pass2 is not None:
+                return profile_data_pass2
             if response_pass1 and response_pass1.status_code == 429:
                 st.error("🚫 Rate limit reached for profile extraction after retries. Please wait a few minutes and try again.")
             else:
@@ -159,111 +249,24 @@ Important:
                 st.error(f"API Error: {response_pass1.status_code if response_pass1 else 'Unknown'} - {error_detail}\n\n{endpoint_info}")
             return None
         
-        result_pass1 = response_pass1.json()
-        content_pass1 = result_pass1['choices'][0]['message']['content']
-        
-        if text_gen.token_tracker and 'usage' in result_pass1:
-            usage = result_pass1['usage']
-            prompt_tokens = usage.get('prompt_tokens', 0)
-            completion_tokens = usage.get('completion_tokens', 0)
-            text_gen.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+        profile_data_pass1 = _read_profile_response(text_gen, response_pass1)
         
-        try:
-            profile_data_pass1 = json.loads(content_pass1)
-        except json.JSONDecodeError:
-            json_match = re.search(r'\{.*\}', content_pass1, re.DOTALL)
-            if json_match:
-                profile_data_pass1 = json.loads(json_match.group())
-            else:
-                st.error("Could not parse extracted profile data from first pass. Please try again.")
-                return None
-        
-        # SECOND PASS: Self-correction (optional)
-        if not ENABLE_PROFILE_PASS2:
-            return profile_data_pass1
-        
-        relevant_resume_sections = extract_relevant_resume_sections(resume_text)
-        
-        if relevant_resume_sections:
-            resume_context = f"""RELEVANT RESUME SECTIONS (Experience and Education only):
-{relevant_resume_sections}"""
-        else:
-            resume_context = f"""RELEVANT RESUME SECTIONS (limited):
-{resume_text[:1500]}"""
-        
-        prompt_pass2 = f"""You are a resume quality checker. Review the extracted profile data against the relevant resume sections and verify accuracy, especially for dates and company names.
-
-{resume_context}
-
-EXTRACTED PROFILE DATA (from first pass):
-{json.dumps(profile_data_pass1, indent=2)}
-
-Please review and correct the extracted data, paying special attention to:
-1. **Dates** - Verify all employment dates, education dates, and certification dates are accurate
-2. **Company Names** - Verify all company/organization names are spelled correctly
-3. **Job Titles** - Verify job titles are accurate
-4. **Education Institutions** - Verify institution names are correct
-
-Return the corrected profile data in the same JSON format. If everything is correct, return the data as-is. If corrections are needed, return the corrected version.
-
-Return ONLY valid JSON with this structure:
-{{
-    "name": "Full name",
-    "email": "Email address",
-    "phone": "Phone number",
-    "location": "City, State/Country",
-    "linkedin": "LinkedIn URL if mentioned",
-    "portfolio": "Portfolio/website URL if mentioned",
-    "summary": "Professional summary or objective (2-3 sentences)",
-    "experience": "Work experience in chronological order with job titles, companies, dates, and key achievements (formatted as bullet points)",
-    "education": "Education details including degrees, institutions, and graduation dates",
-    "skills": "Comma-separated list of technical and soft skills",
-    "certifications": "Professional certifications, awards, publications, or other achievements"
-}}
-
-Return ONLY valid JSON, no additional text or markdown."""
-        
-        payload_pass2 = {
-            "messages": [
-                {"role": "system", "content": "You are a resume quality checker. Verify and correct extracted data, especially dates and company names. Return only valid JSON."},
-                {"role": "user", "content": prompt_pass2}
-            ],
-            "max_tokens": 2000,
-            "temperature": 0.1,
-            "response_format": {"type": "json_object"}
-        }
-        
-        _websocket_keepalive("Verifying profile data...")
+        if payload_pass2 is not None and future_pass2 is None:
+            if profile_data_pass1 is not None and _profile_looks_good(profile_data_pass1):
+                return profile_data_pass1
+            _websocket_keepalive("Verifying profile data...")
+            profile_data_pass2 = _read_profile_response(text_gen, post_pass(payload_pass2))
         
-        def make_request_pass2():
-            return requests.post(
-                text_gen.url,
-                headers=text_gen.headers,
-                json=payload_pass2,
-                timeout=45
-            )
+        if profile_data_pass2 is not None:
+            return profile_data_pass2
         
-        response_pass2 = api_call_with_retry(make_request_pass2, max_retries=3)
+        if profile_data_pass1 is None:
+            st.error("Could not parse extracted profile data from first pass. Please try again.")
+            return None
         
-        if response_pass2 and response_pass2.status_code == 200:
-            result_pass2 = response_pass2.json()
-            content_pass2 = result_pass2['choices'][0]['message']['content']
-            
-            if text_gen.token_tracker and 'usage' in result_pass2:
-                usage = result_pass2['usage']
-                prompt_tokens = usage.get('prompt_tokens', 0)
-                completion_tokens = usage.get('completion_tokens', 0)
-                text_gen.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
-            
-            try:
-                profile_data_corrected = json.loads(content_pass2)
-                return profile_data_corrected
-            except json.JSONDecodeError:
-                st.warning("⚠️ Self-correction pass failed, using initial extraction. Some details may need manual verification.")
-                return profile_data_pass1
-        else:
+        if ENABLE_PROFILE_PASS2:
             st.warning("⚠️ Self-correction pass failed, using initial extraction. Some details may need manual verification.")
-            return profile_data_pass1
+        return profile_data_pass1
             
     except Exception as e:
         st.error(f"Error extracting profile: {e}")
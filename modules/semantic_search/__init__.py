@@ -1,11 +1,12 @@
 """Semantic search module for job matching"""
 from .job_search import SemanticJobSearch
 from .cache import fetch_jobs_with_cache, is_cache_valid
-from .embeddings import generate_and_store_resume_embedding
+from .embeddings import generate_and_store_resume_embedding, start_resume_embedding
 
 __all__ = [
     'SemanticJobSearch',
     'fetch_jobs_with_cache',
     'is_cache_valid',
-    'generate_and_store_resume_embedding'
+    'generate_and_store_resume_embedding',
+    'start_resume_embedding'
 ]
@@ -27,14 +27,13 @@ def is_cache_valid(cache_entry):
 
 def _build_jobs_cache_key(query, location, max_rows, job_type, country):
     """Create a unique cache key for job searches."""
-    normalized_query = (query or "").strip().lower()
-    return "|".join([
-        normalized_query,
+    return (
+        (query or "").strip().lower(),
         (location or "").strip().lower(),
-        str(max_rows),
+        max_rows,
         (job_type or "").strip().lower(),
         (country or "").strip().lower()
-    ])
+    )
 
 
 def _ensure_jobs_cache_structure():
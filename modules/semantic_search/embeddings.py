@@ -1,6 +1,11 @@
 """Resume embedding generation and storage"""
 import streamlit as st
-from modules.utils import get_embedding_generator, get_token_tracker
+from modules.utils import get_embedding_generator, get_token_tracker, _submit_in_background
+
+
+def _join_profile(profile, *keys):
+    """Space-join the non-empty profile fields named by keys, in order."""
+    return ' '.join(str(value) for key in keys if (value := profile.get(key)))
 
 
 def generate_and_store_resume_embedding(resume_text, user_profile=None):
@@ -15,8 +20,7 @@ def generate_and_store_resume_embedding(resume_text, user_profile=None):
     
     # Build resume query text
     if user_profile:
-        profile_data = f"{user_profile.get('summary', '')} {user_profile.get('experience', '')} {user_profile.get('skills', '')}"
-        resume_query = f"{resume_text} {profile_data}"
+        resume_query = f"{resume_text} {_join_profile(user_profile, 'summary', 'experience', 'skills')}"
     else:
         resume_query = resume_text
     
@@ -32,8 +36,27 @@ def generate_and_store_resume_embedding(resume_text, user_profile=None):
     if token_tracker:
         token_tracker.add_embedding_tokens(tokens_used)
     
-    if embedding:
+    if embedding is not None:
         st.session_state.resume_embedding = embedding
         return embedding
     
     return None
+
+
+def start_resume_embedding():
+    """Return the session's resume embedding, or start creating it in the background.
+    
+    The resume embedding does not depend on any job results, so a search can
+    fetch and index jobs while it is generated. Returns (embedding, future):
+    the stored embedding and None, or None and a Future of
+    generate_and_store_resume_embedding. Both are None without a resume text.
+    """
+    resume_embedding = st.session_state.get('resume_embedding')
+    if resume_embedding is not None or not st.session_state.resume_text:
+        return resume_embedding, None
+    future = _submit_in_background(
+        generate_and_store_resume_embedding,
+        st.session_state.resume_text,
+        st.session_state.user_profile if st.session_state.user_profile else None
+    )
+    return None, future
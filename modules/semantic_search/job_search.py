@@ -4,20 +4,64 @@ import hashlib
 import streamlit as st
 import numpy as np
 import chromadb
-from sklearn.metrics.pairwise import cosine_similarity
 from modules.utils import get_token_tracker, _is_streamlit_cloud, _websocket_keepalive, _ensure_websocket_alive
-from modules.utils.config import DEFAULT_MAX_JOBS_TO_INDEX, USE_FAST_SKILL_MATCHING
+from modules.utils.config import (
+    ANN_SEARCH_MIN_JOBS, DEFAULT_MAX_JOBS_TO_INDEX, PERSIST_VECTOR_STORE, USE_FAST_SKILL_MATCHING
+)
+
+# The collection also holds jobs from earlier searches; fetch this many times top_k
+# neighbours so enough of them belong to the current job list
+ANN_OVERFETCH = 4
+
+# Share of job skills that must match verbatim before the embedding pass is skipped
+LITERAL_SKILL_MATCH_SHORTCUT = 0.8
+
+# The in-memory collection is shared by every search in the process; past this size
+# the oldest entries are evicted until it is back to half
+EPHEMERAL_STORE_MAX_ENTRIES = 5000
+
+
+def _top_k_indices(scores, k):
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def _cosine(a, b):
+    """Pairwise cosine similarity between the rows of a and the rows of b."""
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a @ b.T
+
+
+def _as_embedding_matrix(embeddings):
+    """Stack embeddings into a float32 (n, dim) array; no embeddings gives a (0, 0) array."""
+    if len(embeddings) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(embeddings, dtype=np.float32)
 
 
 class SemanticJobSearch:
     """Semantic job search using embeddings"""
-    def __init__(self, embedding_generator, use_persistent_store=True):
+    def __init__(self, embedding_generator, use_persistent_store=None):
         self.embedding_gen = embedding_generator
-        self.job_embeddings = []
+        self.job_embeddings = _as_embedding_matrix([])
+        # Row-normalized float32 matrix aligned with self.jobs; after indexing it is
+        # the same array as job_embeddings
+        self.job_matrix = np.empty((0, 0), dtype=np.float32)
         self.jobs = []
+        # Collection id -> position in self.jobs, for jobs stored in the persistent collection
+        self._job_positions = {}
         self.chroma_client = None
         self.collection = None
         
+        if use_persistent_store is None:
+            use_persistent_store = PERSIST_VECTOR_STORE
         if _is_streamlit_cloud():
             use_persistent_store = False
         
@@ -37,29 +81,42 @@ class SemanticJobSearch:
                 self.use_persistent_store = False
         
         if not self.use_persistent_store and self.chroma_client is None:
+            # In-memory HNSW only: embeddings are reused across searches in this
+            # process without SQLite writes on every upsert
             try:
                 self.chroma_client = chromadb.EphemeralClient()
                 self.collection = self.chroma_client.get_or_create_collection(
                     name="job_embeddings",
                     metadata={"hnsw:space": "cosine"}
                 )
+                count = self.collection.count()
+                if count > EPHEMERAL_STORE_MAX_ENTRIES:
+                    # Other sessions hold this collection, so it is trimmed rather than
+                    # dropped; their searches score evicted jobs with the exact product.
+                    # get() lists ids oldest first
+                    oldest = self.collection.get(limit=count - EPHEMERAL_STORE_MAX_ENTRIES // 2, include=[])
+                    self.collection.delete(ids=oldest['ids'])
             except Exception as e:
-                pass
+                self.collection = None
     
     def _get_job_hash(self, job):
         """Generate a hash for a job to use as ID."""
         job_str = f"{job.get('title', '')}_{job.get('company', '')}_{job.get('url', '')}"
-        return hashlib.md5(job_str.encode()).hexdigest()
+        return hashlib.blake2b(job_str.encode(), digest_size=16).hexdigest()
     
-    def index_jobs(self, jobs, max_jobs_to_index=None):
+    def index_jobs(self, jobs, max_jobs_to_index=None, query=None):
         """Simplified job indexing: Check if job exists, if not, embed and store.
         
+        A query the caller will search with next can be passed along; it is
+        embedded in the same batch as any new jobs, so the following search
+        finds it in the embedding cache instead of making a request of its own.
         Includes WebSocket keepalive calls to prevent connection timeouts.
         """
         if not jobs:
             st.warning("⚠️ No jobs available to index.")
             self.jobs = []
-            self.job_embeddings = []
+            self.job_embeddings = _as_embedding_matrix([])
+            self._build_job_matrix()
             return
         
         _websocket_keepalive("Starting job indexing...", force=True)
@@ -70,6 +127,7 @@ class SemanticJobSearch:
             st.info(f"⚙️ Indexing first {effective_limit} of {len(jobs)} jobs to reduce embedding API calls.")
         jobs_to_index = jobs[:effective_limit]
         self.jobs = jobs_to_index
+        self._job_positions = {}
         
         _ensure_websocket_alive()
         
@@ -81,70 +139,121 @@ class SemanticJobSearch:
         st.info(f"📊 Indexing {len(jobs_to_index)} jobs...")
         _websocket_keepalive("Preparing embeddings...")
         
-        if self.use_persistent_store and self.collection:
+        if self.collection is not None:
             try:
                 job_hashes = [self._get_job_hash(job) for job in jobs_to_index]
+                # One lookup returns the stored embeddings; new ones are kept in memory below
                 existing_data = self.collection.get(ids=job_hashes, include=['embeddings'])
-                existing_ids = set(existing_data.get('ids', [])) if existing_data else set()
+                hash_to_emb = {}
+                if existing_data and existing_data.get('embeddings') is not None:
+                    hash_to_emb.update(zip(existing_data['ids'], existing_data['embeddings']))
                 
                 jobs_to_embed = []
                 indices_to_embed = []
                 for idx, job_hash in enumerate(job_hashes):
-                    if job_hash not in existing_ids:
+                    if job_hash not in hash_to_emb:
                         jobs_to_embed.append(job_texts[idx])
                         indices_to_embed.append(idx)
                 
                 if jobs_to_embed:
                     st.info(f"🔄 Generating embeddings for {len(jobs_to_embed)} new jobs...")
-                    new_embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(jobs_to_embed)
-                    
                     token_tracker = get_token_tracker()
-                    if token_tracker:
-                        token_tracker.add_embedding_tokens(tokens_used)
                     
-                    for idx, emb in zip(indices_to_embed, new_embeddings):
-                        if emb:
-                            job_hash = job_hashes[idx]
-                            self.collection.upsert(
-                                ids=[job_hash],
-                                embeddings=[emb],
-                                documents=[job_texts[idx]],
-                                metadatas=[{"job_index": idx}]
-                            )
+                    # Reposted listings often produce identical texts; embed each text once
+                    unique_texts = list(dict.fromkeys(jobs_to_embed))
+                    text_count = len(unique_texts)
+                    if query and query not in unique_texts:
+                        unique_texts.append(query)
+                    unique_embeddings = [None] * len(unique_texts)
+                    for start, batch_embeddings, tokens_used in self.embedding_gen.iter_embedding_batches(unique_texts):
+                        if token_tracker:
+                            token_tracker.add_embedding_tokens(tokens_used)
+                        unique_embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+                    
+                    text_embeddings = dict(zip(unique_texts[:text_count], unique_embeddings))
+                    new_indices = []
+                    new_embeddings = []
+                    for idx, text in zip(indices_to_embed, jobs_to_embed):
+                        emb = text_embeddings[text]
+                        if emb is not None:
+                            new_indices.append(idx)
+                            new_embeddings.append(emb)
+                    
+                    # One write for all new jobs instead of a SQLite/HNSW transaction per row
+                    if new_indices:
+                        new_matrix = _as_embedding_matrix(new_embeddings)
+                        # chromadb 0.4 only validates plain lists, so the float32 rows are listed here
+                        self.collection.upsert(
+                            ids=[job_hashes[idx] for idx in new_indices],
+                            embeddings=new_matrix.tolist(),
+                            documents=[job_texts[idx] for idx in new_indices],
+                            metadatas=[{"job_index": idx} for idx in new_indices]
+                        )
+                        hash_to_emb.update(
+                            (job_hashes[idx], emb) for idx, emb in zip(new_indices, new_matrix)
+                        )
                 
-                retrieved = self.collection.get(ids=job_hashes, include=['embeddings'])
-                if retrieved and 'embeddings' in retrieved and retrieved['embeddings'] is not None and len(retrieved['embeddings']) > 0:
-                    hash_to_emb = {h: e for h, e in zip(retrieved['ids'], retrieved['embeddings'])}
-                    self.job_embeddings = [hash_to_emb.get(h, None) for h in job_hashes]
-                    self.job_embeddings = [e for e in self.job_embeddings if e is not None]
-                    st.success(f"✅ Indexed {len(self.job_embeddings)} jobs (using persistent store)")
-                else:
-                    self.job_embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(job_texts)
-                    token_tracker = get_token_tracker()
-                    if token_tracker:
-                        token_tracker.add_embedding_tokens(tokens_used)
-                    st.success(f"✅ Indexed {len(self.job_embeddings)} jobs")
+                # Keep self.jobs aligned with the embeddings when some jobs could not be embedded
+                embedded = [idx for idx, job_hash in enumerate(job_hashes) if job_hash in hash_to_emb]
+                self.jobs = [jobs_to_index[idx] for idx in embedded]
+                self.job_embeddings = _as_embedding_matrix([hash_to_emb[job_hashes[idx]] for idx in embedded])
+                self._job_positions = {job_hashes[idx]: pos for pos, idx in enumerate(embedded)}
+                store = "persistent" if self.use_persistent_store else "in-memory"
+                st.success(f"✅ Indexed {len(self.job_embeddings)} jobs (using {store} store)")
             except Exception as e:
-                st.warning(f"⚠️ Error using persistent store: {e}. Generating new embeddings...")
-                self.job_embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(job_texts)
+                st.warning(f"⚠️ Error using vector store: {e}. Generating new embeddings...")
+                self.jobs = jobs_to_index
+                self._job_positions = {}
+                embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(job_texts)
+                self.job_embeddings = _as_embedding_matrix(embeddings)
                 token_tracker = get_token_tracker()
                 if token_tracker:
                     token_tracker.add_embedding_tokens(tokens_used)
                 self.use_persistent_store = False
+                self.collection = None
                 st.success(f"✅ Indexed {len(self.job_embeddings)} jobs")
         else:
-            self.job_embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(job_texts)
+            embeddings, tokens_used = self.embedding_gen.get_embeddings_batch(job_texts)
+            self.job_embeddings = _as_embedding_matrix(embeddings)
             token_tracker = get_token_tracker()
             if token_tracker:
                 token_tracker.add_embedding_tokens(tokens_used)
             st.success(f"✅ Indexed {len(self.job_embeddings)} jobs")
+        
+        self._build_job_matrix()
+    
+    def index_and_query(self, jobs, query, top_k=10, max_jobs_to_index=None):
+        """index_jobs followed by search, with the query embedded alongside the new jobs."""
+        self.index_jobs(jobs, max_jobs_to_index=max_jobs_to_index, query=query)
+        return self.search(query=query, top_k=top_k)
+    
+    def _build_job_matrix(self):
+        """Stack job embeddings into one contiguous, row-normalized float32 matrix."""
+        if not len(self.job_embeddings):
+            self.job_matrix = np.empty((0, 0), dtype=np.float32)
+            return
+        # index_jobs always hands over a freshly stacked float32 array, so it is
+        # normalized in place and shared instead of kept twice
+        matrix = _as_embedding_matrix(self.job_embeddings)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        self.job_embeddings = self.job_matrix = matrix
+    
+    def score_all(self, resume_embedding):
+        """Cosine similarity of an embedding against every indexed job in one matrix-vector product."""
+        query = np.asarray(resume_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm == 0 or not len(self.job_matrix):
+            return np.zeros(len(self.job_matrix), dtype=np.float32)
+        return self.job_matrix @ (query / norm)
     
     def search(self, query=None, top_k=10, resume_embedding=None):
         """Simplified search: Use pre-computed resume embedding if available, otherwise generate from query.
         
         Includes WebSocket keepalive during search operations.
         """
-        if not self.job_embeddings:
+        if not len(self.job_embeddings):
             return []
         
         _websocket_keepalive("Searching jobs...", force=True)
@@ -157,31 +266,58 @@ class SemanticJobSearch:
             token_tracker = get_token_tracker()
             if token_tracker:
                 token_tracker.add_embedding_tokens(tokens_used)
-            if not query_embedding:
+            if query_embedding is None:
                 return []
         else:
             return []
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
         
         _ensure_websocket_alive()
         
-        query_emb = np.array(query_embedding).reshape(1, -1)
-        job_embs = np.array(self.job_embeddings)
-        
-        similarities = cosine_similarity(query_emb, job_embs)[0]
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        top = None
+        if len(self._job_positions) >= ANN_SEARCH_MIN_JOBS:
+            top = self._query_collection(query_embedding, top_k)
+        if top is None:
+            similarities = self.score_all(query_embedding)
+            top = [(idx, float(similarities[idx])) for idx in _top_k_indices(similarities, top_k)]
         
         _websocket_keepalive("Ranking results...")
         
         results = []
-        for idx in top_indices:
+        for idx, score in top:
             results.append({
                 'job': self.jobs[idx],
-                'similarity_score': float(similarities[idx]),
+                'similarity_score': score,
                 'rank': len(results) + 1
             })
         
         return results
     
+    def _query_collection(self, query_embedding, top_k):
+        """Top-k (position, similarity) pairs from the collection's HNSW index.
+        
+        Returns None when the index cannot supply top_k current jobs, so the
+        caller falls back to the exact matrix product.
+        """
+        wanted = min(top_k, len(self._job_positions))
+        try:
+            res = self.collection.query(
+                query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
+                n_results=min(self.collection.count(), top_k * ANN_OVERFETCH),
+                include=['distances']
+            )
+        except Exception:
+            return None
+        top = []
+        for job_hash, distance in zip(res['ids'][0], res['distances'][0]):
+            position = self._job_positions.get(job_hash)
+            if position is not None:
+                # hnsw:space is cosine, so distance = 1 - cosine similarity
+                top.append((position, 1.0 - float(distance)))
+                if len(top) == wanted:
+                    return top
+        return None
+    
     def calculate_skill_match(self, user_skills, job_skills):
         """Calculate skill-based match score.
         
@@ -200,6 +336,14 @@ class SemanticJobSearch:
         if USE_FAST_SKILL_MATCHING:
             return self._calculate_skill_match_string_based(user_skills_list, job_skills_list)
         
+        # Verbatim matches need no embeddings; when they already cover most of the
+        # job's skills the string matcher's answer is good enough
+        user_positions = {s.lower(): i for i, s in enumerate(user_skills_list)}
+        literal_matches = [js for js in job_skills_list if js.lower() in user_positions]
+        if len(literal_matches) >= LITERAL_SKILL_MATCH_SHORTCUT * len(job_skills_list):
+            return self._calculate_skill_match_string_based(user_skills_list, job_skills_list)
+        unmatched_job_skills = [js for js in job_skills_list if js.lower() not in user_positions]
+        
         try:
             _ensure_websocket_alive()
             
@@ -214,12 +358,12 @@ class SemanticJobSearch:
             
             _ensure_websocket_alive()
             
-            job_skills_key = ",".join(sorted(job_skills_list))
+            job_skills_key = ",".join(sorted(unmatched_job_skills))
             if job_skills_key in st.session_state.skill_embeddings_cache:
                 job_skill_embeddings = st.session_state.skill_embeddings_cache[job_skills_key]
                 job_tokens = 0
             else:
-                job_skill_embeddings, job_tokens = self.embedding_gen.get_embeddings_batch(job_skills_list, batch_size=10)
+                job_skill_embeddings, job_tokens = self.embedding_gen.get_embeddings_batch(unmatched_job_skills, batch_size=10)
                 if job_skill_embeddings:
                     st.session_state.skill_embeddings_cache[job_skills_key] = job_skill_embeddings
             
@@ -231,21 +375,23 @@ class SemanticJobSearch:
             if not user_skill_embeddings or not job_skill_embeddings:
                 return self._calculate_skill_match_string_based(user_skills_list, job_skills_list)
             
-            user_embs = np.array(user_skill_embeddings)
-            job_embs = np.array(job_skill_embeddings)
+            user_embs = np.asarray(user_skill_embeddings, dtype=np.float32)
+            job_embs = np.asarray(job_skill_embeddings, dtype=np.float32)
             
-            similarity_matrix = cosine_similarity(job_embs, user_embs)
+            similarity_matrix = _cosine(job_embs, user_embs)
             
             similarity_threshold = 0.7
-            matched_skills = []
-            matched_indices = set()
+            matched_skills = list(literal_matches)
+            matched_indices = {user_positions[js.lower()] for js in literal_matches}
             
-            for job_idx, job_skill in enumerate(job_skills_list):
-                best_match_idx = np.argmax(similarity_matrix[job_idx])
-                best_similarity = similarity_matrix[job_idx][best_match_idx]
-                
-                if best_similarity >= similarity_threshold and best_match_idx not in matched_indices:
-                    matched_skills.append(job_skill)
+            # Best user skill per job skill in one pass; only rows that clear the
+            # threshold need the one-to-one assignment below
+            best_match = similarity_matrix.argmax(axis=1)
+            best_similarity = similarity_matrix[np.arange(len(best_match)), best_match]
+            for job_idx in np.flatnonzero(best_similarity >= similarity_threshold):
+                best_match_idx = int(best_match[job_idx])
+                if best_match_idx not in matched_indices:
+                    matched_skills.append(unmatched_job_skills[job_idx])
                     matched_indices.add(best_match_idx)
             
             match_score = len(matched_skills) / len(job_skills_list) if job_skills_list else 0.0
@@ -261,14 +407,19 @@ class SemanticJobSearch:
         user_skills_lower = [s.lower() for s in user_skills_list]
         job_skills_lower = [s.lower() for s in job_skills_list]
         
-        matched_skills = []
+        user_skills_set = set(user_skills_lower)
+        
+        matched_count = 0
+        matched_skills = set()
         for job_skill in job_skills_lower:
-            for user_skill in user_skills_lower:
-                if job_skill in user_skill or user_skill in job_skill:
-                    matched_skills.append(job_skill)
-                    break
+            # Exact hits are a set lookup; only the rest need the substring scan
+            if job_skill in matched_skills or job_skill in user_skills_set or any(
+                job_skill in user_skill or user_skill in job_skill for user_skill in user_skills_lower
+            ):
+                matched_count += 1
+                matched_skills.add(job_skill)
         
-        match_score = len(matched_skills) / len(job_skills_lower) if job_skills_lower else 0.0
+        match_score = matched_count / len(job_skills_lower) if job_skills_lower else 0.0
         missing_skills = [job_skills_list[i] for i, js in enumerate(job_skills_lower) if js not in matched_skills]
         
         return min(match_score, 1.0), missing_skills[:5]
@@ -1,12 +1,15 @@
 """Dashboard display components"""
+import functools
 from typing import Optional
 
 import streamlit as st
 import pandas as pd
 import gc
-from modules.analysis import calculate_salary_band, filter_jobs_by_domains, filter_jobs_by_salary
-from modules.semantic_search import SemanticJobSearch, fetch_jobs_with_cache, generate_and_store_resume_embedding
+import re
+from modules.analysis import calculate_salary_band, filter_jobs
+from modules.semantic_search import SemanticJobSearch, fetch_jobs_with_cache, start_resume_embedding
 from modules.utils import get_embedding_generator, get_job_scraper, get_text_generator
+from modules.semantic_search.embeddings import _join_profile
 from modules.utils.config import _determine_index_limit
 import streamlit.components.v1 as components
 
@@ -16,6 +19,10 @@ import streamlit.components.v1 as components
 
 _DASHBOARD_STYLE_KEY = "_careerlens_dashboard_v2_styles"
 
+# Separators seen in free-text skill lists; "/" is left alone since it sits
+# inside skill names such as CI/CD or TCP/IP
+_SKILL_SPLIT_RE = re.compile(r'[,;|\n]+')
+
 _ICON_PATHS = {
     "eye": """
         <path d="M1 12s4-8 11-8 11 8-4 8-11 8-11-8-11-8Z"></path>
@@ -45,8 +52,13 @@ _ICON_PATHS = {
 }
 
 
+@functools.lru_cache(maxsize=None)
 def _icon_svg(name: str, *, size: int = 20, stroke: Optional[str] = None, opacity: float = 1.0) -> str:
-    """Return an inline SVG icon that matches the requested brand specs."""
+    """Return an inline SVG icon that matches the requested brand specs.
+    
+    Cached: the markup depends only on the arguments and the same few icons
+    are drawn on every rerun.
+    """
     path = _ICON_PATHS.get(name, "")
     stroke_color = stroke or "var(--icon-default)"
     return (
@@ -428,8 +440,9 @@ def _inject_dashboard_styles() -> None:
     st.session_state[_DASHBOARD_STYLE_KEY] = True
 
 
+@functools.lru_cache(maxsize=None)
 def _render_sidebar_nav(active_item: str) -> str:
-    """Build the navigation rail markup."""
+    """Build the navigation rail markup (cached per active item)."""
     nav_items = [
         {"label": "Dashboard", "icon": "layout-grid"},
         {"label": "Resume Analysis", "icon": "file-text"},
@@ -519,6 +532,25 @@ def _render_section(title: str, content_html: str) -> str:
     """
 
 
+def _user_skill_terms(user_skills) -> list:
+    """Lowercased, stripped entries of the profile's free-text skill list."""
+    return [s.strip().lower() for s in _SKILL_SPLIT_RE.split(str(user_skills)) if s.strip()]
+
+
+def _covered_job_skills(user_terms, user_set, job_skills) -> list:
+    """(skill, lowercased skill, covered) for each non-empty skill of a job.
+    
+    A job skill is covered when it equals one of the user's skills or either
+    contains the other; exact matches are settled by the set lookup.
+    """
+    covered = []
+    for skill in job_skills:
+        if isinstance(skill, str) and (js := skill.lower().strip()):
+            hit = js in user_set or any(us in js or js in us for us in user_terms)
+            covered.append((skill, js, hit))
+    return covered
+
+
 def display_skill_matching_matrix(user_profile):
     """Display skill matching calculation matrix to help users understand ranking"""
     st.markdown("---")
@@ -654,17 +686,20 @@ def display_market_positioning_profile(matched_jobs, user_profile):
     avg_salary = (salary_min + salary_max) // 2
 
     user_skills = user_profile.get('skills', '')
-    all_job_skills = []
-    for result in matched_jobs:
-        all_job_skills.extend(result['job'].get('skills', []))
-
-    user_skills_list = [s.lower().strip() for s in str(user_skills).split(',') if s.strip()]
-    skill_gaps = set()
-    for job_skill in all_job_skills:
-        if isinstance(job_skill, str):
-            job_skill_lower = job_skill.lower().strip()
-            if job_skill_lower and not any(us in job_skill_lower or job_skill_lower in us for us in user_skills_list):
-                skill_gaps.add(job_skill_lower)
+    user_skills_set = set(_user_skill_terms(user_skills))
+    # Skills repeat across postings, so normalize and dedupe them before the
+    # substring check; exact matches drop out with the set difference
+    job_skills = {
+        job_skill.lower().strip()
+        for result in matched_jobs
+        for job_skill in result['job'].get('skills', [])
+        if isinstance(job_skill, str)
+    }
+    job_skills.discard('')
+    skill_gaps = {
+        js for js in job_skills - user_skills_set
+        if not any(us in js or js in us for us in user_skills_set)
+    }
 
     num_skill_gaps = len(skill_gaps)
 
@@ -696,6 +731,24 @@ def display_market_positioning_profile(matched_jobs, user_profile):
     components.html(layout_html, height=860, scrolling=False)
 
 
+def _get_indexed_search(jobs: list, max_jobs_to_index: int, query=None) -> SemanticJobSearch:
+    """SemanticJobSearch indexed on jobs, kept in this session while the job set is unchanged.
+    
+    Applying the same filters again searches the existing index instead of
+    rebuilding it. The engine is per session, so its token usage and progress
+    messages belong to the user who built it. query, when known, is embedded
+    in the same batch as the jobs whenever the index is built.
+    """
+    key = (tuple((job['title'], job['company'], job.get('url', '')) for job in jobs), max_jobs_to_index)
+    cached = st.session_state.get('refine_search_engine')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    search_engine = SemanticJobSearch(get_embedding_generator())
+    search_engine.index_jobs(jobs, max_jobs_to_index=max_jobs_to_index, query=query)
+    st.session_state.refine_search_engine = (key, search_engine)
+    return search_engine
+
+
 def display_refine_results_section(matched_jobs, user_profile):
     """Display Refine Results section with filters"""
     st.markdown("---")
@@ -745,6 +798,9 @@ def display_refine_results_section(matched_jobs, user_profile):
                 return
             
             with st.spinner("🔄 Refreshing results from Indeed..."):
+                # As in the sidebar, a missing resume embedding is created while the jobs are fetched
+                resume_embedding, resume_embedding_future = start_resume_embedding()
+                
                 jobs = fetch_jobs_with_cache(
                     scraper,
                     search_query,
@@ -761,39 +817,30 @@ def display_refine_results_section(matched_jobs, user_profile):
                 
                 total_fetched = len(jobs)
                 
-                if target_domains:
-                    jobs = filter_jobs_by_domains(jobs, target_domains)
-                
-                if salary_expectation > 0:
-                    jobs = filter_jobs_by_salary(jobs, salary_expectation)
+                jobs = filter_jobs(jobs, target_domains, salary_expectation)
                 
                 if not jobs:
                     st.warning(f"⚠️ No jobs match your filters. Found {total_fetched} jobs but none passed your criteria.")
                     return
                 
-                embedding_gen = get_embedding_generator()
                 desired_matches = min(15, len(jobs))
                 jobs_to_index_limit = _determine_index_limit(len(jobs), desired_matches)
                 top_match_count = min(desired_matches, jobs_to_index_limit)
-                search_engine = SemanticJobSearch(embedding_gen)
-                search_engine.index_jobs(jobs, max_jobs_to_index=jobs_to_index_limit)
-                
-                resume_embedding = st.session_state.get('resume_embedding')
-                if not resume_embedding and st.session_state.resume_text:
-                    resume_embedding = generate_and_store_resume_embedding(
-                        st.session_state.resume_text,
-                        st.session_state.user_profile if st.session_state.user_profile else None
-                    )
                 
+                # Without a resume text there is no embedding to wait for, so the
+                # profile query is known now and goes out with the jobs' batch
                 resume_query = None
-                if not resume_embedding:
-                    if st.session_state.resume_text:
+                if resume_embedding is None and resume_embedding_future is None:
+                    resume_query = _join_profile(st.session_state.user_profile, 'summary', 'experience', 'skills', 'education')
+                search_engine = _get_indexed_search(jobs, jobs_to_index_limit, resume_query)
+                
+                if resume_embedding_future is not None:
+                    resume_embedding = resume_embedding_future.result()
+                    if resume_embedding is None:
                         resume_query = st.session_state.resume_text
-                        if st.session_state.user_profile.get('summary'):
-                            profile_data = f"{st.session_state.user_profile.get('summary', '')} {st.session_state.user_profile.get('experience', '')} {st.session_state.user_profile.get('skills', '')}"
-                            resume_query = f"{resume_query} {profile_data}"
-                    else:
-                        resume_query = f"{st.session_state.user_profile.get('summary', '')} {st.session_state.user_profile.get('experience', '')} {st.session_state.user_profile.get('skills', '')} {st.session_state.user_profile.get('education', '')}"
+                        profile = st.session_state.user_profile
+                        if profile.get('summary'):
+                            resume_query = f"{resume_query} {_join_profile(profile, 'summary', 'experience', 'skills')}"
                 
                 results = search_engine.search(query=resume_query, top_k=top_match_count, resume_embedding=resume_embedding)
                 
@@ -818,6 +865,22 @@ def display_refine_results_section(matched_jobs, user_profile):
                 st.rerun()
 
 
+_MATCHES_TABLE_COLUMNS = ['Rank', 'Match Score', 'Job Title', 'Company', 'Location', 'Key Matching Skills', 'Missing Critical Skill', '_index']
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _build_matches_df(rows: tuple) -> pd.DataFrame:
+    """Ranked matches table from hashable row tuples.
+    
+    Row selection and other widget events rerun the page with the same
+    ranking, so the frame is built once per distinct set of rows.
+    """
+    return pd.DataFrame(
+        [(*row[:5], list(row[5]), *row[6:]) for row in rows],
+        columns=_MATCHES_TABLE_COLUMNS
+    )
+
+
 def display_ranked_matches_table(matched_jobs, user_profile):
     """Display Smart Ranked Matches Table with interactive dataframe"""
     if not matched_jobs:
@@ -827,31 +890,24 @@ def display_ranked_matches_table(matched_jobs, user_profile):
     st.markdown("### Top AI-Ranked Opportunities")
     st.caption("💡 **Tip:** Click any row to expand and see full job description, match analysis, and application copilot")
     
-    user_skills = user_profile.get('skills', '')
-    
-    def calc_skill_match(user_skills_str, job_skills_list):
-        if not user_skills_str or not job_skills_list:
-            return 0.0, []
-        user_skills_lower = [s.lower().strip() for s in str(user_skills_str).split(',') if s.strip()]
-        job_skills_lower = [s.lower().strip() for s in job_skills_list if isinstance(s, str) and s.strip()]
-        if not user_skills_lower or not job_skills_lower:
-            return 0.0, []
-        matched_skills = []
-        for job_skill in job_skills_lower:
-            for user_skill in user_skills_lower:
-                if job_skill in user_skill or user_skill in job_skill:
-                    matched_skills.append(job_skill)
-                    break
-        match_score = len(matched_skills) / len(job_skills_lower) if job_skills_lower else 0.0
-        missing_skills = [s for s in job_skills_lower if s not in matched_skills]
-        return min(match_score, 1.0), missing_skills[:5]
+    # Split the profile's skills once for every row below
+    user_terms = _user_skill_terms(user_profile.get('skills', ''))
+    user_set = set(user_terms)
     
     for result in matched_jobs:
-        if 'skill_match_score' not in result:
-            job_skills = result['job'].get('skills', [])
-            skill_score, missing_skills = calc_skill_match(user_skills, job_skills)
-            result['skill_match_score'] = skill_score
-            result['missing_skills'] = missing_skills
+        if 'matching_skills' not in result:
+            covered = _covered_job_skills(user_terms, user_set, result['job'].get('skills', []))
+            matched_count = sum(hit for _, _, hit in covered)
+            # Shared with display_match_breakdown so it need not rescan the skills
+            result['skill_coverage'] = (matched_count, len(covered))
+            result['matching_skills'] = [skill for skill, _, hit in covered[:6] if hit][:4]
+            if 'skill_match_score' not in result:
+                if user_terms and covered:
+                    result['skill_match_score'] = min(matched_count / len(covered), 1.0)
+                    result['missing_skills'] = [js for _, js, hit in covered if not hit][:5]
+                else:
+                    result['skill_match_score'] = 0.0
+                    result['missing_skills'] = []
         
         if 'combined_match_score' not in result:
             semantic_score = result.get('similarity_score', 0.0)
@@ -861,39 +917,28 @@ def display_ranked_matches_table(matched_jobs, user_profile):
     
     matched_jobs.sort(key=lambda x: x.get('combined_match_score', 0.0), reverse=True)
     
-    table_data = []
+    rows = []
     for i, result in enumerate(matched_jobs):
         job = result['job']
         semantic_score = result.get('similarity_score', 0.0)
         skill_score = result.get('skill_match_score', 0.0)
         match_score = result.get('combined_match_score', (semantic_score * 0.6) + (skill_score * 0.4))
         
-        job_skills = job.get('skills', [])
-        matching_skills = []
-        user_skills_list = [s.lower().strip() for s in str(user_skills).split(',') if s.strip()]
-        for js in job_skills[:6]:
-            if isinstance(js, str):
-                js_lower = js.lower().strip()
-                if any(us in js_lower or js_lower in us for us in user_skills_list):
-                    matching_skills.append(js)
-                    if len(matching_skills) >= 4:
-                        break
-        
         missing_critical = result.get('missing_skills', [])
         missing_critical_skill = missing_critical[0] if missing_critical else "None"
         
-        table_data.append({
-            'Rank': i + 1,
-            'Match Score': int(match_score * 100),
-            'Job Title': job['title'],
-            'Company': job['company'],
-            'Location': job['location'],
-            'Key Matching Skills': matching_skills[:4] if matching_skills else [],
-            'Missing Critical Skill': missing_critical_skill,
-            '_index': i
-        })
+        rows.append((
+            i + 1,
+            int(match_score * 100),
+            job['title'],
+            job['company'],
+            job['location'],
+            tuple(result['matching_skills']),
+            missing_critical_skill,
+            i
+        ))
     
-    df = pd.DataFrame(table_data)
+    df = _build_matches_df(tuple(rows))
     
     column_config = {
         'Rank': st.column_config.NumberColumn(
@@ -969,25 +1014,15 @@ def display_match_breakdown(matched_jobs, user_profile):
     skill_score = selected_result.get('skill_match_score', 0.0)
     missing_skills = selected_result.get('missing_skills', [])
     
-    user_skills = user_profile.get('skills', '')
-    job_skills = job.get('skills', [])
-    user_skills_list = [s.lower().strip() for s in str(user_skills).split(',') if s.strip()]
-    job_skills_list = [s.lower().strip() for s in job_skills if isinstance(s, str) and s.strip()]
-    
-    matched_skills_count = 0
-    for js in job_skills_list:
-        if any(us in js or js in us for us in user_skills_list):
-            matched_skills_count += 1
-    
-    total_required = len(job_skills_list) if job_skills_list else 1
+    skill_coverage = selected_result.get('skill_coverage')
+    if skill_coverage is None:
+        user_terms = _user_skill_terms(user_profile.get('skills', ''))
+        covered = _covered_job_skills(user_terms, set(user_terms), job.get('skills', []))
+        skill_coverage = (sum(hit for _, _, hit in covered), len(covered))
+    matched_skills_count, total_required = skill_coverage
+    total_required = total_required or 1
     skill_overlap_pct = (matched_skills_count / total_required * 100) if total_required > 0 else 0
     
-    text_gen = get_text_generator()
-    if text_gen is None:
-        recruiter_note = "AI analysis unavailable. Please configure Azure OpenAI credentials."
-    else:
-        recruiter_note = text_gen.generate_recruiter_note(job, user_profile, semantic_score, skill_score)
-    
     rank_position = st.session_state.selected_job_index + 1 if st.session_state.selected_job_index is not None else 0
     
     expander_title = f"📋 Rank #{rank_position}: {job['title']} at {job['company']}"
@@ -1038,7 +1073,17 @@ def display_match_breakdown(matched_jobs, user_profile):
                 st.warning(f"⚠️ **Missing Skills:** {', '.join(missing_skills[:5])}")
             
             st.markdown("---")
-            st.info(f"**🤖 AI Recruiter Analysis:**\n\n{recruiter_note}")
+            # The note is streamed into its slot so the rest of the breakdown renders first
+            note_slot = st.empty()
+            text_gen = get_text_generator()
+            if text_gen is None:
+                recruiter_note = "AI analysis unavailable. Please configure Azure OpenAI credentials."
+            else:
+                recruiter_note = text_gen.generate_recruiter_note(
+                    job, user_profile, semantic_score, skill_score,
+                    on_text=lambda text: note_slot.info(f"**🤖 AI Recruiter Analysis:**\n\n{text}▌")
+                )
+            note_slot.info(f"**🤖 AI Recruiter Analysis:**\n\n{recruiter_note}")
         
         with col2:
             st.markdown("#### Application Copilot")
@@ -1,36 +1,54 @@
 """Job card display components"""
+import string
 import streamlit as st
 
+# Company rating strings for 0-5 stars
+_STARS = tuple("⭐" * i for i in range(6))
 
-def display_job_card(result, index):
-    """Display a job card with match score and details"""
-    job = result['job']
-    score = result.get('similarity_score', 0.0)
-    
-    remote_badge = "🏠 Remote" if job['is_remote'] else ""
-    rating = job['company_rating']
-    stars = "⭐" * int(rating) if rating > 0 else ""
-    
-    st.markdown(f"""
+# Parsed once at import; each card only substitutes its fields
+_JOB_CARD_TEMPLATE = string.Template("""
     <div class="job-card">
         <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 1rem;">
             <div style="flex-grow: 1;">
-                <h3 style="margin: 0; color: var(--primary-accent);">#{index} {job['title']}</h3>
+                <h3 style="margin: 0; color: var(--primary-accent);">#${index} ${title}</h3>
                 <p style="margin: 0.5rem 0; color: var(--text-secondary); font-size: 0.95rem;">
-                    🏢 <strong>{job['company']}</strong> {stars} • 📍 {job['location']} {remote_badge}
+                    🏢 <strong>${company}</strong> ${stars} • 📍 ${location} ${remote_badge}
                 </p>
             </div>
             <div class="match-score">
-                {score:.1%} Match
+                ${score} Match
             </div>
         </div>
         <div style="display: flex; gap: 1rem; flex-wrap: wrap; margin-bottom: 0.5rem; color: var(--text-secondary);">
-            <span>⏰ {job['job_type']}</span>
-            <span>💰 {job['salary']}</span>
-            <span>📅 {job['posted_date']}</span>
+            <span>⏰ ${job_type}</span>
+            <span>💰 ${salary}</span>
+            <span>📅 ${posted_date}</span>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """)
+
+
+def display_job_card(result, index):
+    """Display a job card with match score and details"""
+    job = result['job']
+    score = result.get('similarity_score', 0.0)
+    
+    remote_badge = "🏠 Remote" if job['is_remote'] else ""
+    rating = job['company_rating']
+    stars = _STARS[min(5, int(rating))] if rating > 0 else ""
+    
+    st.markdown(_JOB_CARD_TEMPLATE.substitute(
+        index=index,
+        title=job['title'],
+        company=job['company'],
+        stars=stars,
+        location=job['location'],
+        remote_badge=remote_badge,
+        score=f"{score:.1%}",
+        job_type=job['job_type'],
+        salary=job['salary'],
+        posted_date=job['posted_date']
+    ), unsafe_allow_html=True)
     
     col1, col2 = st.columns(2)
     
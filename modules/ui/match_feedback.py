@@ -1,6 +1,15 @@
 """Match score feedback display"""
+import string
 import streamlit as st
 
+# Parsed once at import; only the score changes between renders
+_MATCH_SCORE_TEMPLATE = string.Template("""
+        <div style="text-align: center; margin: 1rem 0;">
+            <div class="match-score-display">${score}%</div>
+            <p style="color: var(--text-secondary); margin-top: 0.5rem;">Match Score</p>
+        </div>
+        """)
+
 
 def display_match_score_feedback(match_score, missing_keywords, job_title):
     """Display match score and feedback to user"""
@@ -24,12 +33,7 @@ def display_match_score_feedback(match_score, missing_keywords, job_title):
             score_color = "🔴"
             feedback = "Moderate match. Your resume may need more tailoring."
         
-        st.markdown(f"""
-        <div style="text-align: center; margin: 1rem 0;">
-            <div class="match-score-display">{score_percent:.0f}%</div>
-            <p style="color: var(--text-secondary); margin-top: 0.5rem;">Match Score</p>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(_MATCH_SCORE_TEMPLATE.substitute(score=f"{score_percent:.0f}"), unsafe_allow_html=True)
         st.caption(f"**Analysis:** {feedback}")
     
     if missing_keywords:
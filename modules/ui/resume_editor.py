@@ -1,12 +1,97 @@
 """Resume editor and generator UI components"""
+import hashlib
 import json
 import streamlit as st
 import time
-import requests
-from modules.utils import get_text_generator, get_embedding_generator, api_call_with_retry
+from modules.utils import get_text_generator, get_embedding_generator, api_call_with_retry, _submit_in_background
 from modules.resume_generator import generate_docx_from_json, generate_pdf_from_json, format_resume_as_text
 from .match_feedback import display_match_score_feedback
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json writes the same document
+    orjson = None
+
+
+def _refine_bullets(text_gen, bullets):
+    """Rewrite several resume bullets in one completion; returns the new texts in order, or None"""
+    refinement_prompt = f"""Improve each of these resume bullet points. Make them more quantified, impactful, and achievement-focused. Use numbers, percentages, or metrics when possible.
+
+Current Bullets (JSON array):
+{json.dumps(bullets, ensure_ascii=False)}
+
+Return ONLY a JSON array of strings with one improved bullet per input bullet, in the same order, no additional text."""
+    
+    payload = {
+        "messages": [
+            {"role": "system", "content": "You are a resume writing expert. Improve bullet points to be quantified and achievement-focused."},
+            {"role": "user", "content": refinement_prompt}
+        ],
+        "max_tokens": 150 * len(bullets),
+        "temperature": 0.7
+    }
+    
+    def make_request():
+        return text_gen.session.post(text_gen.url, json=payload, timeout=30)
+    
+    response = api_call_with_retry(make_request, max_retries=2, breaker=text_gen.breaker)
+    if not (response and response.status_code == 200):
+        return None
+    content = response.json()['choices'][0]['message']['content'].strip()
+    start, end = content.find('['), content.rfind(']')
+    try:
+        refined = json.loads(content[start:end + 1]) if start != -1 and end > start else None
+    except json.JSONDecodeError:
+        refined = None
+    if isinstance(refined, list) and len(refined) == len(bullets):
+        return [str(text).strip() for text in refined]
+    # A lone bullet sometimes comes back as plain text rather than an array
+    return [content] if len(bullets) == 1 else None
+
+
+def _render_bullet_editor(i, j, bullet):
+    """Render one experience bullet with its AI refine button; returns the bullet's text.
+    
+    Not a fragment: the edited resume and the download payloads are built
+    outside it, so an edit or refine has to rerun the whole app to reach them.
+    """
+    key = f'exp_bullet_{i}_{j}'
+    # A widget's state can't be changed once it has rendered, so the refined
+    # text is parked under a separate key and applied before the text area
+    if f'{key}_refined' in st.session_state:
+        st.session_state[key] = st.session_state.pop(f'{key}_refined')
+    
+    col_bullet1, col_bullet2 = st.columns([4, 1])
+    with col_bullet1:
+        bullet_text = st.text_area(
+            f"Bullet {j+1}",
+            value=bullet,
+            height=60,
+            key=key
+        )
+    with col_bullet2:
+        if st.button("✨", key=f'refine_bullet_{i}_{j}', help="Refine this bullet with AI", use_container_width=True):
+            # Queue the bullet before calling out: a click on another bullet
+            # while this request is in flight interrupts the run, and the next
+            # run then sends both bullets in a single request
+            pending = st.session_state.setdefault('_pending_refines', {})
+            pending[key] = bullet_text if bullet_text else bullet
+            with st.spinner("🤖 Refining..."):
+                text_gen = get_text_generator()
+                if text_gen is None:
+                    st.error("⚠️ Azure OpenAI is not configured.")
+                    return bullet_text
+                keys = list(pending)
+                refined = _refine_bullets(text_gen, [pending[k] for k in keys])
+                for k in keys:
+                    pending.pop(k, None)
+                if refined:
+                    for k, refined_text in zip(keys, refined):
+                        st.session_state[f'{k}_refined'] = refined_text
+                    st.rerun()
+    
+    return bullet_text
+
 
 def render_structured_resume_editor(resume_data):
     """Render structured resume JSON in editable Streamlit form"""
@@ -66,9 +151,9 @@ Return ONLY the improved summary text, no additional explanation."""
                 }
                 
                 def make_request():
-                    return requests.post(text_gen.url, headers=text_gen.headers, json=payload, timeout=30)
+                    return text_gen.session.post(text_gen.url, json=payload, timeout=30)
                 
-                response = api_call_with_retry(make_request, max_retries=2)
+                response = api_call_with_retry(make_request, max_retries=2, breaker=text_gen.breaker)
                 if response and response.status_code == 200:
                     result = response.json()
                     refined_text = result['choices'][0]['message']['content'].strip()
@@ -105,46 +190,7 @@ Return ONLY the improved summary text, no additional explanation."""
             bullets = exp.get('bullets', [])
             edited_bullets = []
             for j, bullet in enumerate(bullets):
-                col_bullet1, col_bullet2 = st.columns([4, 1])
-                with col_bullet1:
-                    bullet_text = st.text_area(
-                        f"Bullet {j+1}",
-                        value=bullet,
-                        height=60,
-                        key=f'exp_bullet_{i}_{j}'
-                    )
-                with col_bullet2:
-                    if st.button("✨", key=f'refine_bullet_{i}_{j}', help="Refine this bullet with AI", use_container_width=True):
-                        with st.spinner("🤖 Refining..."):
-                            text_gen = get_text_generator()
-                            if text_gen is None:
-                                st.error("⚠️ Azure OpenAI is not configured.")
-                                return
-                            refinement_prompt = f"""Improve this resume bullet point. Make it more quantified, impactful, and achievement-focused. Use numbers, percentages, or metrics when possible.
-
-Current Bullet:
-{bullet_text if bullet_text else bullet}
-
-Return ONLY the improved bullet point, no additional text."""
-                            
-                            payload = {
-                                "messages": [
-                                    {"role": "system", "content": "You are a resume writing expert. Improve bullet points to be quantified and achievement-focused."},
-                                    {"role": "user", "content": refinement_prompt}
-                                ],
-                                "max_tokens": 150,
-                                "temperature": 0.7
-                            }
-                            
-                            def make_request():
-                                return requests.post(text_gen.url, headers=text_gen.headers, json=payload, timeout=30)
-                            
-                            response = api_call_with_retry(make_request, max_retries=2)
-                            if response and response.status_code == 200:
-                                result = response.json()
-                                refined_text = result['choices'][0]['message']['content'].strip()
-                                st.session_state[f'exp_bullet_{i}_{j}'] = refined_text
-                                st.rerun()
+                bullet_text = _render_bullet_editor(i, j, bullet)
                 
                 if bullet_text.strip():
                     edited_bullets.append(bullet_text.strip())
@@ -179,17 +225,80 @@ Return ONLY the improved bullet point, no additional text."""
     return edited_data
 
 
+def _job_key(job):
+    """Identify a job posting for the per-job keyword cache"""
+    return (job.get('title', ''), job.get('company', ''), job.get('url', ''))
+
+
+def _cached_job_keywords(job):
+    """Return keywords extracted for this job by analyze_job_bundle, or None if not cached"""
+    cached = st.session_state.get('job_keywords')
+    if cached and cached.get('job_key') == _job_key(job):
+        return cached['keywords']
+    return None
+
+
+def _json_dumps_indented(data):
+    """Indented JSON for the resume download"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2)
+
+
+def _resume_match_text(resume_data):
+    """Resume JSON as compact text for match scoring.
+    
+    The text is only embedded and compared, so indentation would just add
+    characters (and tokens) to every request.
+    """
+    return json.dumps(resume_data, ensure_ascii=False, separators=(',', ':'))
+
+
+def _resume_fingerprint(resume_data):
+    """Content digest of the resume JSON, used to tell whether it changed between reruns"""
+    if orjson is not None:
+        canonical = orjson.dumps(resume_data, option=orjson.OPT_SORT_KEYS)
+    else:
+        canonical = json.dumps(resume_data, sort_keys=True).encode()
+    return hashlib.blake2b(canonical, digest_size=8).digest()
+
+
+def _resume_export_files(resume_data):
+    """PDF bytes, DOCX bytes and plain text for the resume, rebuilt only when its content changes.
+    
+    The download buttons render on every rerun, so the last export is kept in
+    session state under a digest of the resume JSON.
+    """
+    digest = _resume_fingerprint(resume_data)
+    cached = st.session_state.get('resume_exports')
+    if cached and cached[0] == digest:
+        return cached[1:]
+    
+    # The PDF builds on a worker while the DOCX builds here; both spend part
+    # of their time in zlib, which runs without the GIL
+    pdf_future = _submit_in_background(generate_pdf_from_json, resume_data)
+    docx_bytes = generate_docx_from_json(resume_data)
+    txt_content = format_resume_as_text(resume_data)
+    pdf_bytes = pdf_future.result()
+    # A failed build is retried on the next rerun rather than cached
+    if pdf_bytes and docx_bytes:
+        st.session_state.resume_exports = (digest, pdf_bytes, docx_bytes, txt_content)
+    return pdf_bytes, docx_bytes, txt_content
+
+
 def display_resume_generator():
     """Display the resume generator interface with structured resume editing"""
-    if st.session_state.selected_job is None:
+    # Read through one local reference; each st.session_state access goes
+    # through Streamlit's session proxy
+    state = st.session_state
+    job = state.selected_job
+    if job is None:
         st.warning("No job selected. Please select a job first.")
         if st.button("← Back to Jobs"):
-            st.session_state.show_resume_generator = False
+            state.show_resume_generator = False
             st.rerun()
         return
     
-    job = st.session_state.selected_job
-    
     st.markdown('<h1 class="main-header">📄 Resume Generator</h1>', unsafe_allow_html=True)
     
     st.markdown(f"""
@@ -199,24 +308,26 @@ def display_resume_generator():
     </div>
     """, unsafe_allow_html=True)
     
-    if not st.session_state.user_profile.get('name') or not st.session_state.user_profile.get('experience'):
+    user_profile = state.user_profile
+    if not user_profile.get('name') or not user_profile.get('experience'):
         st.error("⚠️ Please complete your profile first!")
         if st.button("← Go to Profile"):
-            st.session_state.show_resume_generator = False
+            state.show_resume_generator = False
             st.rerun()
         return
     
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        st.write("**Your Profile:**", st.session_state.user_profile.get('name', 'N/A'))
+        st.write("**Your Profile:**", user_profile.get('name', 'N/A'))
     
     with col2:
         if st.button("← Back to Jobs"):
-            st.session_state.show_resume_generator = False
-            st.session_state.generated_resume = None
-            st.session_state.match_score = None
-            st.session_state.missing_keywords = None
+            state.show_resume_generator = False
+            state.generated_resume = None
+            state.match_score = None
+            state.missing_keywords = None
+            state.job_keywords = None
             st.rerun()
     
     st.markdown("---")
@@ -227,26 +338,34 @@ def display_resume_generator():
             if text_gen is None:
                 st.error("⚠️ Azure OpenAI is not configured.")
                 return
-            raw_resume_text = st.session_state.get('resume_text')
-            resume_data = text_gen.generate_resume(
-                st.session_state.user_profile, 
+            raw_resume_text = state.get('resume_text')
+            # One completion returns both the tailored resume and the job's keywords;
+            # it is streamed into a preview so progress is visible while it generates
+            preview = st.empty()
+            bundle = text_gen.analyze_job_bundle(
+                user_profile, 
                 job,
-                raw_resume_text=raw_resume_text
+                raw_resume_text=raw_resume_text,
+                on_text=lambda text: preview.code(text[-1500:], language="json")
             )
+            preview.empty()
+            resume_data = bundle['resume'] if bundle else None
             
             if resume_data:
-                st.session_state.generated_resume = resume_data
+                state.generated_resume = resume_data
+                state.job_keywords = {'job_key': _job_key(job), 'keywords': bundle['keywords']}
                 
                 with st.spinner("📊 Analyzing resume match..."):
                     embedding_gen = get_embedding_generator()
-                    resume_text = json.dumps(resume_data, indent=2)
+                    resume_text = _resume_match_text(resume_data)
                     match_score, missing_keywords = text_gen.calculate_match_score(
                         resume_text,
                         job.get('description', ''),
-                        embedding_gen
+                        embedding_gen,
+                        job_keywords=bundle['keywords']
                     )
-                    st.session_state.match_score = match_score
-                    st.session_state.missing_keywords = missing_keywords
+                    state.match_score = match_score
+                    state.missing_keywords = missing_keywords
                 
                 st.success("✅ Resume generated successfully!")
                 st.balloons()
@@ -255,30 +374,30 @@ def display_resume_generator():
             else:
                 st.error("❌ Failed to generate resume. Please try again.")
     
-    if st.session_state.generated_resume and st.session_state.get('match_score') is not None:
+    generated_resume = state.get('generated_resume')
+    match_score = state.get('match_score')
+    if generated_resume and match_score is not None:
         display_match_score_feedback(
-            st.session_state.match_score,
-            st.session_state.missing_keywords,
+            match_score,
+            state.get('missing_keywords'),
             job['title']
         )
     
-    if st.session_state.generated_resume:
+    if generated_resume:
         st.markdown("---")
         
-        edited_resume_data = render_structured_resume_editor(st.session_state.generated_resume)
+        edited_resume_data = render_structured_resume_editor(generated_resume)
         
         if edited_resume_data:
-            st.session_state.generated_resume = edited_resume_data
+            state.generated_resume = generated_resume = edited_resume_data
         
         st.markdown("---")
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
+        pdf_file, docx_file, txt_content = _resume_export_files(generated_resume)
+        
         with col1:
-            pdf_file = generate_pdf_from_json(
-                st.session_state.generated_resume,
-                filename=f"resume_{job['company']}_{job['title']}.pdf"
-            )
             if pdf_file:
                 st.download_button(
                     label="📥 Download as PDF",
@@ -289,10 +408,6 @@ def display_resume_generator():
                 )
         
         with col2:
-            docx_file = generate_docx_from_json(
-                st.session_state.generated_resume,
-                filename=f"resume_{job['company']}_{job['title']}.docx"
-            )
             if docx_file:
                 st.download_button(
                     label="📥 Download as DOCX",
@@ -303,7 +418,7 @@ def display_resume_generator():
                 )
         
         with col3:
-            json_data = json.dumps(st.session_state.generated_resume, indent=2)
+            json_data = _json_dumps_indented(generated_resume)
             st.download_button(
                 label="📥 Download as JSON",
                 data=json_data,
@@ -313,7 +428,6 @@ def display_resume_generator():
             )
         
         with col4:
-            txt_content = format_resume_as_text(st.session_state.generated_resume)
             st.download_button(
                 label="📥 Download as TXT",
                 data=txt_content,
@@ -338,12 +452,13 @@ def display_resume_generator():
                     st.error("⚠️ Azure OpenAI is not configured.")
                     return
                 embedding_gen = get_embedding_generator()
-                resume_text = json.dumps(st.session_state.generated_resume, indent=2)
+                resume_text = _resume_match_text(generated_resume)
                 match_score, missing_keywords = text_gen.calculate_match_score(
                     resume_text,
                     job.get('description', ''),
-                    embedding_gen
+                    embedding_gen,
+                    job_keywords=_cached_job_keywords(job)
                 )
-                st.session_state.match_score = match_score
-                st.session_state.missing_keywords = missing_keywords
+                state.match_score = match_score
+                state.missing_keywords = missing_keywords
                 st.rerun()
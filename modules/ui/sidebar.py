@@ -6,10 +6,17 @@ from modules.resume_upload import extract_text_from_resume, extract_profile_from
 from modules.semantic_search import (
     SemanticJobSearch,
     fetch_jobs_with_cache,
-    generate_and_store_resume_embedding
+    generate_and_store_resume_embedding,
+    start_resume_embedding
 )
-from modules.analysis import filter_jobs_by_domains, filter_jobs_by_salary
-from modules.utils import get_embedding_generator, get_job_scraper, _websocket_keepalive, _ensure_websocket_alive
+from modules.analysis import filter_jobs
+from modules.utils import (
+    get_embedding_generator,
+    get_job_scraper,
+    _websocket_keepalive,
+    _ensure_websocket_alive
+)
+from modules.semantic_search.embeddings import _join_profile
 from modules.utils.config import _determine_index_limit
 from .dashboard import display_skill_matching_matrix
 
@@ -133,6 +140,10 @@ def render_sidebar():
                 
                 progress_bar = st.progress(0, text="🔍 Starting job search...")
                 
+                # The resume embedding does not depend on the job results, so when it
+                # is missing create it while the jobs are fetched and indexed
+                resume_embedding, resume_embedding_future = start_resume_embedding()
+                
                 progress_bar.progress(10, text="📡 Fetching jobs from Indeed...")
                 _websocket_keepalive("Connecting to job API...")
                 
@@ -157,11 +168,7 @@ def render_sidebar():
                 progress_bar.progress(30, text=f"✅ Found {total_fetched} jobs, applying filters...")
                 _websocket_keepalive()
                 
-                if target_domains:
-                    jobs = filter_jobs_by_domains(jobs, target_domains)
-                
-                if salary_expectation > 0:
-                    jobs = filter_jobs_by_salary(jobs, salary_expectation)
+                jobs = filter_jobs(jobs, target_domains, salary_expectation)
                 
                 if not jobs:
                     progress_bar.empty()
@@ -188,24 +195,20 @@ def render_sidebar():
                 
                 _ensure_websocket_alive()
                 
-                resume_embedding = st.session_state.get('resume_embedding')
-                if not resume_embedding and st.session_state.resume_text:
+                if resume_embedding_future is not None:
                     progress_bar.progress(70, text="🔗 Creating resume embedding...")
                     _websocket_keepalive("Creating resume embedding...")
-                    resume_embedding = generate_and_store_resume_embedding(
-                        st.session_state.resume_text,
-                        st.session_state.user_profile if st.session_state.user_profile else None
-                    )
+                    resume_embedding = resume_embedding_future.result()
                 
                 resume_query = None
-                if not resume_embedding:
+                if resume_embedding is None:
                     if st.session_state.resume_text:
                         resume_query = st.session_state.resume_text
-                        if st.session_state.user_profile.get('summary'):
-                            profile_data = f"{st.session_state.user_profile.get('summary', '')} {st.session_state.user_profile.get('experience', '')} {st.session_state.user_profile.get('skills', '')}"
-                            resume_query = f"{resume_query} {profile_data}"
+                        profile = st.session_state.user_profile
+                        if profile.get('summary'):
+                            resume_query = f"{resume_query} {_join_profile(profile, 'summary', 'experience', 'skills')}"
                     else:
-                        resume_query = f"{st.session_state.user_profile.get('summary', '')} {st.session_state.user_profile.get('experience', '')} {st.session_state.user_profile.get('skills', '')} {st.session_state.user_profile.get('education', '')}"
+                        resume_query = _join_profile(st.session_state.user_profile, 'summary', 'experience', 'skills', 'education')
                 
                 progress_bar.progress(80, text="🎯 Finding best matches...")
                 results = search_engine.search(query=resume_query, top_k=top_match_count, resume_embedding=resume_embedding)
@@ -3,9 +3,16 @@ from .config import (
     DEFAULT_EMBEDDING_BATCH_SIZE,
     DEFAULT_MAX_JOBS_TO_INDEX,
     EMBEDDING_BATCH_DELAY,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    ANN_SEARCH_MIN_JOBS,
     RAPIDAPI_MAX_REQUESTS_PER_MINUTE,
     ENABLE_PROFILE_PASS2,
+    PROFILE_PASS2_ON_DEMAND,
     USE_FAST_SKILL_MATCHING,
+    EXACT_TOKENS,
+    PERSIST_VECTOR_STORE,
     _determine_index_limit
 )
 from .helpers import (
@@ -16,12 +23,18 @@ from .helpers import (
     _chunked_sleep,
     _is_streamlit_cloud,
     _ensure_websocket_alive,
-    ProgressTracker
+    _script_ctx_executor,
+    _submit_in_background,
+    ProgressTracker,
+    CircuitBreaker,
+    CircuitOpenError,
+    circuit_breaker_for
 )
 from .api_clients import (
     APIMEmbeddingGenerator,
     AzureOpenAITextGenerator,
     RateLimiter,
+    TokenBucket,
     IndeedScraperAPI,
     TokenUsageTracker,
     get_token_tracker,
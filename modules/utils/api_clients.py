@@ -5,6 +5,7 @@ This module contains all API client classes including:
 - APIMEmbeddingGenerator: Azure OpenAI embedding generation
 - AzureOpenAITextGenerator: Azure OpenAI text generation  
 - RateLimiter: Rate limiting for API calls
+- TokenBucket: Proactive request/token pacing for Azure OpenAI quotas
 - IndeedScraperAPI: Job scraping via RapidAPI
 - TokenUsageTracker: Token usage tracking
 """
@@ -13,16 +14,26 @@ import os
 import time
 import json
 import re
+import string
 import hashlib
+import base64
+import functools
+import threading
 import streamlit as st
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, wait
 import requests
+from requests.adapters import HTTPAdapter
 import tiktoken
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 from .config import (
     DEFAULT_EMBEDDING_BATCH_SIZE,
     EMBEDDING_BATCH_DELAY,
+    EMBEDDING_MAX_CONCURRENCY,
+    EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE,
+    EXACT_TOKENS,
     RAPIDAPI_MAX_REQUESTS_PER_MINUTE,
     USE_FAST_SKILL_MATCHING
 )
@@ -31,9 +42,291 @@ from .helpers import (
     _websocket_keepalive,
     _chunked_sleep,
     _is_streamlit_cloud,
-    _ensure_websocket_alive
+    _ensure_websocket_alive,
+    _script_ctx_executor,
+    circuit_breaker_for,
+    WEBSOCKET_KEEPALIVE_INTERVAL
 )
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # optional speedup; stdlib json parses the same documents
+    _json_loads = json.loads
+
+# Minimum seconds between progress widget updates during batch embedding
+PROGRESS_UPDATE_INTERVAL = 0.25
+# Upper bound on cached embeddings / token counts held by one generator
+EMBEDDING_CACHE_MAX_ENTRIES = 2048
+# Storage precision for embeddings; cosine ranking is insensitive to the low mantissa bits
+EMBEDDING_DTYPE = np.float16
+# Chat replies kept per generator, keyed by a hash of the full request payload
+COMPLETION_CACHE_MAX_ENTRIES = 256
+
+
+@functools.lru_cache(maxsize=1)
+def _cl100k():
+    """Load the cl100k_base encoding once per process."""
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@functools.lru_cache(maxsize=EMBEDDING_CACHE_MAX_ENTRIES)
+def _exact_token_count(text):
+    return len(_cl100k().encode(text))
+
+
+def _estimate_tokens(text):
+    """Approximate cl100k_base token count as UTF-8 bytes / 4.
+    
+    Only used for pacing and for usage the server did not report, so the
+    estimate is enough; set EXACT_TOKENS to tokenize with tiktoken instead.
+    """
+    if EXACT_TOKENS:
+        return _exact_token_count(text)
+    return len(text.encode('utf-8')) >> 2
+
+
+def _decode_embedding(value):
+    """Decode a base64 float32 embedding (or a plain float list) into a unit-length numpy vector.
+    
+    Normalizing once here lets every similarity downstream be a plain dot product.
+    Vectors are stored as EMBEDDING_DTYPE; upcast to float32 before doing math on them.
+    """
+    if isinstance(value, str):
+        vector = np.frombuffer(base64.b64decode(value), dtype=np.float32)
+    else:
+        vector = np.asarray(value, dtype=np.float32)
+    return (vector / (np.linalg.norm(vector) + 1e-12)).astype(EMBEDDING_DTYPE)
+
+
+def _build_session(headers):
+    """Create a pooled HTTP session so repeated calls reuse TCP/TLS connections."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+def _text_key(text):
+    """Stable content hash used to key per-text caches."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _bounded_put(cache, key, value, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+    """Insert into a dict cache, evicting the oldest entries once it is full."""
+    cache[key] = value
+    while len(cache) > max_entries:
+        del cache[next(iter(cache))]
+
+
+def _parse_llm_json(content):
+    """Parse a JSON object from an LLM reply, tolerating code fences and surrounding text.
+    
+    Raises json.JSONDecodeError when no JSON object can be recovered.
+    """
+    content = content.strip()
+    if content.startswith("```"):
+        lines = content.split('\n')
+        content = '\n'.join(lines[1:-1]) if lines[-1].startswith('```') else '\n'.join(lines[1:])
+    try:
+        return _json_loads(content)
+    except json.JSONDecodeError:
+        # Fall back to the outermost {...} span; an index scan is linear
+        start, end = content.find('{'), content.rfind('}')
+        if start != -1 and end > start:
+            return _json_loads(content[start:end + 1])
+        raise
+
+
+# Azure words per-request token limit errors like "...exceeds the max tokens per request..."
+_TOKEN_LIMIT_BODY_RE = re.compile(r'max(?:imum)?[\s_-]*(?:context[\s_-]*length|tokens?)', re.IGNORECASE)
+_ERROR_BODY_SCAN_LIMIT = 1024
+
+def _is_token_limit_error(response):
+    """True for a 429 whose body blames the request's token count rather than the request rate."""
+    return response.status_code == 429 and bool(
+        _TOKEN_LIMIT_BODY_RE.search((response.text or "")[:_ERROR_BODY_SCAN_LIMIT])
+    )
+
+
+# What a chat call and reading its reply can raise; anything else is a bug and should surface.
+# AttributeError/TypeError cover replies that are valid JSON but not an object
+_CHAT_ERRORS = (requests.RequestException, ValueError, KeyError, IndexError, AttributeError, TypeError)
+
+# Seniority keywords for the offline fallback in analyze_seniority_level
+_TITLE_WORD_RE = re.compile(r'[a-z]+')
+_EXECUTIVE_TITLE_WORDS = frozenset({'executive', 'director', 'vp'})
+_EXECUTIVE_TITLE_PHRASES = ('vice president', 'head of')
+_SENIOR_TITLE_WORDS = frozenset({'senior', 'sr', 'lead', 'principal'})
+_ENTRY_TITLE_WORDS = frozenset({'junior', 'jr', 'entry', 'associate', 'graduate'})
+
+
+def _missing_keywords(text, keywords):
+    """Return the keywords that do not occur in text (case-insensitive substring match).
+    
+    All keywords are matched in one scan of the text with a compiled alternation
+    inside a lookahead, so overlapping matches are seen at every position.
+    """
+    keywords = [k for k in keywords if isinstance(k, str)]
+    if not keywords:
+        return []
+    patterns = sorted({k.lower() for k in keywords}, key=len, reverse=True)
+    scanner = re.compile('(?=(' + '|'.join(map(re.escape, patterns)) + '))')
+    found = set(scanner.findall(text.lower()))
+    # At each position only the longest alternative is captured; a shorter
+    # keyword starting there is a prefix of that capture
+    for pattern in patterns:
+        if pattern not in found and any(pattern in match for match in found):
+            found.add(pattern)
+    return [k for k in keywords if k.lower() not in found]
+
+
+_RESUME_SYSTEM_INSTRUCTIONS = """You are an expert resume writer with expertise in ATS optimization and career coaching.
+Your task is to create a tailored resume by analyzing the job description and adapting the user's profile.
+Return ONLY valid JSON - no markdown, no additional text, no code blocks."""
+
+_RESUME_JSON_STRUCTURE = """{
+  "header": {
+    "name": "Full Name",
+    "title": "Professional Title (tailored to job)",
+    "email": "email@example.com",
+    "phone": "phone number",
+    "location": "City, State/Country",
+    "linkedin": "LinkedIn URL or empty string",
+    "portfolio": "Portfolio URL or empty string"
+  },
+  "summary": "2-3 sentence professional summary tailored to the job description, emphasizing relevant experience and skills",
+  "skills_highlighted": ["Skill 1", "Skill 2", "Skill 3", ...],
+  "experience": [
+    {
+      "company": "Company Name",
+      "title": "Job Title",
+      "dates": "Date Range",
+      "bullets": [
+        "Rewritten bullet point emphasizing relevant achievement...",
+        "Another tailored bullet point..."
+      ]
+    }
+  ],
+  "education": "Education details formatted as text",
+  "certifications": "Certifications, awards, or other achievements formatted as text"
+}"""
+
+_JOB_BUNDLE_JSON_STRUCTURE = """{
+  "resume": <the tailored resume, using the resume structure below>,
+  "keywords": ["the most important technical skills, tools, technologies, and qualifications mentioned in the job description", ...]
+}
+
+Resume structure:
+""" + _RESUME_JSON_STRUCTURE
+
+
+_RESUME_INSTRUCTIONS = """INSTRUCTIONS:
+1. Analyze the job posting requirements and identify key skills, technologies, and qualifications needed
+2. Tailor the user's profile to match the job description by:
+   - Rewriting the summary to emphasize relevant experience
+   - Highlighting skills that match the job requirements
+   - Rewriting experience bullet points to emphasize relevant achievements
+   - Using keywords from the job description for ATS optimization
+3. Focus on achievements and measurable results
+4. Maintain accuracy - only use information from the provided profile"""
+
+
+def _resume_prompt_template(response_structure):
+    """Resume prompt with every invariant block first, so the deployment can reuse the cached prefix."""
+    return string.Template(
+        f"{_RESUME_SYSTEM_INSTRUCTIONS}\n\n{_RESUME_INSTRUCTIONS}\n\n"
+        f"Return your response as a JSON object with this exact structure:\n{response_structure}\n\n"
+        "$job_description\n\n$structured_profile$raw_resume_section\n\n"
+        "IMPORTANT: Return ONLY the JSON object, no markdown code blocks, no additional text."
+    )
+
+
+_RESUME_PROMPT = _resume_prompt_template(_RESUME_JSON_STRUCTURE)
+_JOB_BUNDLE_PROMPT = _resume_prompt_template(_JOB_BUNDLE_JSON_STRUCTURE)
+
+_JOB_POSTING_BLOCK = string.Template("""JOB POSTING TO MATCH:
+Title: $title
+Company: $company
+Description: $description
+Required Skills: $skills""")
+
+_PROFILE_BLOCK = string.Template("""STRUCTURED PROFILE:
+Name: $name
+Email: $email
+Phone: $phone
+Location: $location
+LinkedIn: $linkedin
+Portfolio: $portfolio
+Summary: $summary
+Experience: $experience
+Education: $education
+Skills: $skills
+Certifications: $certifications""")
+
+_PROFILE_FIELDS = ('name', 'email', 'phone', 'location', 'linkedin', 'portfolio',
+                   'summary', 'experience', 'education', 'skills', 'certifications')
+
+_KEYWORD_PROMPT = string.Template("""Extract the most important technical skills, tools, technologies, and qualifications mentioned in this job description. 
+Return ONLY a JSON object with a "keywords" array, no additional text.
+
+Job Description:
+$job_description
+
+Return format: {"keywords": ["keyword1", "keyword2", "keyword3", ...]}""")
+
+_SENIORITY_PROMPT = string.Template("""Analyze these job titles and determine the most common seniority level.
+        
+Job Titles:
+$titles
+
+Return ONLY a JSON object with this structure:
+{
+    "seniority": "Entry Level" | "Mid Level" | "Mid-Senior Level" | "Senior Level" | "Executive Level",
+    "confidence": "high" | "medium" | "low"
+}
+
+Choose the most appropriate seniority level based on the job titles.""")
+
+_ACCREDITATION_PROMPT = string.Template("""Analyze these job descriptions and recommend the most valuable professional accreditation or certification for Hong Kong market.
+
+Job Descriptions:
+$job_descriptions
+
+User's Current Skills: $user_skills
+
+Return ONLY a JSON object:
+{
+    "accreditation": "Name of certification (e.g., PMP, HKICPA, AWS Certified)",
+    "reason": "Brief reason why this certification is valuable"
+}
+
+Focus on certifications that are:
+1. Highly valued in Hong Kong market
+2. Frequently mentioned in these job descriptions
+3. Would unlock more opportunities for the user""")
+
+_RECRUITER_NOTE_PROMPT = string.Template("""You are a professional recruiter in Hong Kong. Write a brief, actionable note about why this candidate is a good fit for this role.
+
+Job Title: $job_title
+Job Description (excerpt): $job_desc
+
+Candidate Summary: $user_summary
+Candidate Experience (excerpt): $user_experience
+
+Match Scores:
+- Semantic Match: $semantic_score
+- Skill Match: $skill_score
+
+Write a 2-3 sentence recruiter note that:
+1. Highlights the strongest match points
+2. Mentions any specific experience or skills that align well
+3. Provides actionable feedback
+
+Return ONLY the recruiter note text, no labels or formatting.""")
+
 
 class APIMEmbeddingGenerator:
     """Azure OpenAI Embedding Generator"""
@@ -47,22 +340,73 @@ class APIMEmbeddingGenerator:
         self.api_version = "2024-02-01"
         self.url = f"{self.endpoint}/openai/deployments/{self.deployment}/embeddings?api-version={self.api_version}"
         self.headers = {"api-key": self.api_key, "Content-Type": "application/json"}
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.session = _build_session(self.headers)
+        # Shared with every other client of the same Azure host
+        self.breaker = circuit_breaker_for(self.url)
+        # Pace requests against the deployment quota instead of waiting for 429s
+        self.rpm_bucket = TokenBucket.per_minute(EMBEDDING_REQUESTS_PER_MINUTE)
+        self.tpm_bucket = TokenBucket.per_minute(EMBEDDING_TOKENS_PER_MINUTE)
+        # Keyed by _text_key; the generator is a cache_resource, so this survives reruns.
+        # Single-text hits are moved to the end, so a repeated query or resume is not
+        # evicted by the stream of job texts indexed after it
+        self._emb_cache = OrderedDict()
+        # Batch workers and other sessions use the cache at the same time; every
+        # read, insert and eviction holds this lock
+        self._emb_cache_lock = threading.Lock()
+    
+    def _remember(self, key, embedding):
+        """Cache an embedding; the stored vector is made read-only since it is shared."""
+        embedding.flags.writeable = False
+        with self._emb_cache_lock:
+            _bounded_put(self._emb_cache, key, embedding)
+    
+    def _pace(self, tokens):
+        """Block until both the request and token buckets have capacity."""
+        delay = max(self.rpm_bucket.consume(1), self.tpm_bucket.consume(tokens))
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _post(self, payload):
+        """POST an embedding request, draining the buckets if the server still answers 429.
+        
+        A 429 that blames the request's token count leaves the buckets alone:
+        callers pass _is_token_limit_error as api_call_with_retry's give_up,
+        so it comes straight back and _request_embeddings splits the batch.
+        """
+        response = self.session.post(self.url, json=payload, timeout=30)
+        if response.status_code == 429 and not _is_token_limit_error(response):
+            self.rpm_bucket.penalize()
+            self.tpm_bucket.penalize()
+        return response
     
     def get_embedding(self, text):
-        """Generate embedding for a single text."""
+        """Generate embedding for a single text.
+        
+        Texts embedded before are served from the in-memory cache and report 0 tokens.
+        """
+        key = _text_key(text)
+        with self._emb_cache_lock:
+            cached = self._emb_cache.get(key)
+            if cached is not None:
+                self._emb_cache.move_to_end(key)
+        if cached is not None:
+            return cached, 0
         try:
-            payload = {"input": text, "model": self.deployment}
-            estimated_tokens = len(self.encoding.encode(text))
+            payload = {"input": text, "model": self.deployment, "encoding_format": "base64"}
+            estimated_tokens = _estimate_tokens(text)
+            self._pace(estimated_tokens)
             
             def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
+                return self._post(payload)
             
-            response = api_call_with_retry(make_request, max_retries=3)
+            response = api_call_with_retry(
+                make_request, max_retries=3, breaker=self.breaker, give_up=_is_token_limit_error
+            )
             
             if response and response.status_code == 200:
-                result = response.json()
-                embedding = result['data'][0]['embedding']
+                result = _json_loads(response.content)
+                embedding = _decode_embedding(result['data'][0]['embedding'])
+                self._remember(key, embedding)
                 tokens_used = result['usage'].get('total_tokens', 0) if 'usage' in result else estimated_tokens
                 return embedding, tokens_used
             else:
@@ -71,88 +415,169 @@ class APIMEmbeddingGenerator:
             st.error(f"Error generating embedding: {e}")
             return None, 0
     
-    def get_embeddings_batch(self, texts, batch_size=None):
-        """Generate embeddings for a batch of texts.
+    def _embed_batch(self, batch, batch_num, total_batches):
+        """Embed one batch of texts.
+        
+        Cached texts are filled in locally and each distinct uncached text is
+        sent once; duplicates within the batch share its result.
+        Returns (batch_embeddings, tokens_used); batch_embeddings is aligned with
+        batch and holds None for texts that could not be embedded.
+        """
+        keys = [_text_key(text) for text in batch]
+        with self._emb_cache_lock:
+            batch_embeddings = [self._emb_cache.get(key) for key in keys]
+        first_index = {}
+        for idx, emb in enumerate(batch_embeddings):
+            if emb is None:
+                first_index.setdefault(keys[idx], idx)
+        if not first_index:
+            return batch_embeddings, 0
+        
+        missing = list(first_index.values())
+        embeddings, tokens_used = self._request_embeddings(
+            [batch[idx] for idx in missing], [keys[idx] for idx in missing], batch_num, total_batches
+        )
+        for idx, emb in zip(missing, embeddings):
+            batch_embeddings[idx] = emb
+        for idx, key in enumerate(keys):
+            if batch_embeddings[idx] is None:
+                batch_embeddings[idx] = batch_embeddings[first_index[key]]
+        return batch_embeddings, tokens_used
+    
+    def _request_embeddings(self, texts, keys, batch_num, total_batches, _depth=0):
+        """Embed texts in one request, splitting them in half and retrying the halves if it is rejected.
+        Returns (embeddings, tokens_used) with embeddings aligned with texts (None where it failed)."""
+        embeddings = [None] * len(texts)
+        try:
+            payload = {"input": texts, "model": self.deployment, "encoding_format": "base64"}
+            estimated_batch_tokens = sum(_estimate_tokens(text) for text in texts)
+            self._pace(estimated_batch_tokens)
+            
+            def make_request():
+                return self._post(payload)
+            
+            response = api_call_with_retry(
+                make_request, max_retries=3, breaker=self.breaker, give_up=_is_token_limit_error
+            )
+            
+            if response and response.status_code == 200:
+                data = _json_loads(response.content)
+                # Items carry their input position; place them directly instead of sorting
+                for item in data['data']:
+                    idx = item['index']
+                    embedding = _decode_embedding(item['embedding'])
+                    self._remember(keys[idx], embedding)
+                    embeddings[idx] = embedding
+                tokens_used = data['usage'].get('total_tokens', 0) if 'usage' in data else estimated_batch_tokens
+                return embeddings, tokens_used
+            if response is None:
+                # Retries exhausted (rate limit, timeouts) or the circuit is open:
+                # smaller requests would hit the same wall
+                st.warning(f"⚠️ Embedding requests keep failing. Skipping batch {batch_num}/{total_batches}.")
+                return embeddings, 0
+            failure = f"status {response.status_code}"
+        except Exception as e:
+            failure = e
+        
+        if len(texts) == 1:
+            return embeddings, 0
+        if _depth == 0:
+            st.warning(f"⚠️ Batch {batch_num} was rejected ({failure}), retrying it in smaller parts...")
+        # Halving gets an oversized request under the per-request limit, or isolates
+        # a bad input, in log2(n) rounds instead of one request per text
+        mid = len(texts) // 2
+        left, left_tokens = self._request_embeddings(texts[:mid], keys[:mid], batch_num, total_batches, _depth + 1)
+        right, right_tokens = self._request_embeddings(texts[mid:], keys[mid:], batch_num, total_batches, _depth + 1)
+        return left + right, left_tokens + right_tokens
+    
+    def iter_embedding_batches(self, texts, batch_size=None):
+        """Yield embeddings batch by batch as each API request completes.
+        
+        Up to EMBEDDING_MAX_CONCURRENCY batch requests are in flight at once.
+        Request start times keep the EMBEDDING_BATCH_DELAY spacing, so the
+        request rate matches the old serial loop while round-trips overlap.
+        
+        Yields (start_index, batch_embeddings, tokens_used) tuples in completion
+        order, where batch_embeddings is aligned with
+        texts[start_index:start_index + len(batch_embeddings)] and holds None for
+        any text that could not be embedded. Consumers can index each batch
+        while the remaining requests are still running.
         
         This method includes WebSocket keepalive calls to prevent connection
         timeouts during long-running embedding operations.
         """
         if not texts:
-            return [], 0
+            return
         
         effective_batch_size = batch_size or DEFAULT_EMBEDDING_BATCH_SIZE
         if effective_batch_size <= 0:
             effective_batch_size = DEFAULT_EMBEDDING_BATCH_SIZE
         
-        embeddings = []
-        total_tokens_used = 0
         progress_bar = st.progress(0)
         status_text = st.empty()
         total_batches = (len(texts) + effective_batch_size - 1) // effective_batch_size
+        last_progress_update = 0.0
+        completed = 0
         
         # Initial keepalive before starting batch processing
         _websocket_keepalive("Starting embedding generation...", force=True)
         
-        for i in range(0, len(texts), effective_batch_size):
-            batch = texts[i:i + effective_batch_size]
-            batch_num = i // effective_batch_size + 1
-            progress = (i + len(batch)) / len(texts)
-            progress_bar.progress(progress)
-            status_text.text(f"🔄 Generating embeddings: {i + len(batch)}/{len(texts)} (batch {batch_num}/{total_batches})")
-            
-            # Keepalive before each batch
-            _ensure_websocket_alive()
-            
-            if i > 0 and EMBEDDING_BATCH_DELAY > 0:
-                _chunked_sleep(EMBEDDING_BATCH_DELAY, f"Batch {batch_num}/{total_batches}")
-            
-            try:
-                payload = {"input": batch, "model": self.deployment}
-                estimated_batch_tokens = sum(len(self.encoding.encode(text)) for text in batch)
-                _websocket_keepalive(f"Processing batch {batch_num}/{total_batches}...")
-                
-                def make_request():
-                    return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-                
-                response = api_call_with_retry(make_request, max_retries=3)
-                
-                # Keepalive after API call completes
-                _ensure_websocket_alive()
-                
-                if response and response.status_code == 200:
-                    data = response.json()
-                    sorted_data = sorted(data['data'], key=lambda x: x['index'])
-                    embeddings.extend([item['embedding'] for item in sorted_data])
-                    tokens_used = data['usage'].get('total_tokens', 0) if 'usage' in data else estimated_batch_tokens
-                    total_tokens_used += tokens_used
-                elif response and response.status_code == 429:
-                    st.warning(f"⚠️ Rate limit reached after retries. Skipping batch {batch_num}/{total_batches}.")
-                    _websocket_keepalive()
-                else:
-                    st.warning(f"⚠️ Batch embedding failed, trying individual calls for batch {batch_num}...")
-                    _websocket_keepalive("Retrying with individual calls...")
-                    for idx, text in enumerate(batch):
-                        if idx % 2 == 0:
-                            _ensure_websocket_alive()
-                        emb, tokens = self.get_embedding(text)
-                        if emb:
-                            embeddings.append(emb)
-                            total_tokens_used += tokens
-            except Exception as e:
-                st.warning(f"⚠️ Error processing batch {batch_num}, trying individual calls: {e}")
-                _websocket_keepalive("Recovering from error...")
-                for idx, text in enumerate(batch):
-                    if idx % 2 == 0:
-                        _ensure_websocket_alive()
-                    emb, tokens = self.get_embedding(text)
-                    if emb:
-                        embeddings.append(emb)
-                        total_tokens_used += tokens
-        
-        progress_bar.empty()
-        status_text.empty()
+        schedule_start = time.monotonic()
+        
+        def run_batch(start):
+            batch_index = start // effective_batch_size
+            delay = schedule_start + batch_index * EMBEDDING_BATCH_DELAY - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            batch = texts[start:start + effective_batch_size]
+            return self._embed_batch(batch, batch_index + 1, total_batches)
+        
+        try:
+            with _script_ctx_executor(min(EMBEDDING_MAX_CONCURRENCY, total_batches)) as executor:
+                futures = {
+                    executor.submit(run_batch, start): start
+                    for start in range(0, len(texts), effective_batch_size)
+                }
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=WEBSOCKET_KEEPALIVE_INTERVAL, return_when=FIRST_COMPLETED)
+                    # Keepalive while requests are in flight
+                    _ensure_websocket_alive()
+                    for future in done:
+                        batch_embeddings, batch_tokens = future.result()
+                        completed += len(batch_embeddings)
+                        # Each widget update is a round-trip to the browser; throttle them
+                        now = time.monotonic()
+                        if now - last_progress_update > PROGRESS_UPDATE_INTERVAL or completed == len(texts):
+                            progress_bar.progress(completed / len(texts))
+                            status_text.text(f"🔄 Generating embeddings: {completed}/{len(texts)}")
+                            last_progress_update = now
+                        yield futures[future], batch_embeddings, batch_tokens
+        finally:
+            progress_bar.empty()
+            status_text.empty()
         _websocket_keepalive("Embedding generation complete", force=True)
-        return embeddings, total_tokens_used
+    
+    def get_embeddings_batch(self, texts, batch_size=None):
+        """Generate embeddings for a batch of texts.
+        
+        Collects the output of iter_embedding_batches; texts that could not be
+        embedded are dropped from the returned list.
+        """
+        embeddings = [None] * len(texts)
+        total_tokens_used = 0
+        for start, batch_embeddings, tokens_used in self.iter_embedding_batches(texts, batch_size):
+            embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+            total_tokens_used += tokens_used
+        return [emb for emb in embeddings if emb is not None], total_tokens_used
+    
+    def embed_texts(self, texts):
+        """Embed a few texts in a single request, without progress widgets.
+        
+        Returns (embeddings, tokens_used) with embeddings aligned with texts and
+        None for any text that could not be embedded; cached texts are not resent.
+        """
+        return self._embed_batch(list(texts), 1, 1)
 
 
 class AzureOpenAITextGenerator:
@@ -167,131 +592,103 @@ class AzureOpenAITextGenerator:
         self.api_version = "2024-02-01"
         self.url = f"{self.endpoint}/openai/deployments/{self.deployment}/chat/completions?api-version={self.api_version}"
         self.headers = {"api-key": self.api_key, "Content-Type": "application/json"}
+        self.session = _build_session(self.headers)
+        self.breaker = circuit_breaker_for(self.url)
         self.token_tracker = token_tracker
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        # Shared by every session through cache_resource, like the embedding cache
+        self._completion_cache = OrderedDict()
+        self._completion_cache_lock = threading.Lock()
     
-    def generate_resume(self, user_profile, job_posting, raw_resume_text=None):
-        """Generate a tailored resume based on user profile and job posting using Context Sandwich approach.
-        Returns structured JSON data instead of formatted text."""
-        from .helpers import _websocket_keepalive, api_call_with_retry
+    def _build_resume_prompt(self, user_profile, job_posting, raw_resume_text, template):
+        """Fill a resume prompt template with the job posting and the user's profile."""
+        job_description = _JOB_POSTING_BLOCK.substitute(
+            title=job_posting.get('title', 'N/A'),
+            company=job_posting.get('company', 'N/A'),
+            description=job_posting.get('description', 'N/A'),
+            skills=', '.join(job_posting.get('skills', []))
+        )
+        structured_profile = _PROFILE_BLOCK.substitute(
+            {field: user_profile.get(field, 'N/A') for field in _PROFILE_FIELDS}
+        )
         
-        system_instructions = """You are an expert resume writer with expertise in ATS optimization and career coaching.
-Your task is to create a tailored resume by analyzing the job description and adapting the user's profile.
-Return ONLY valid JSON - no markdown, no additional text, no code blocks."""
-
-        job_description = f"""JOB POSTING TO MATCH:
-Title: {job_posting.get('title', 'N/A')}
-Company: {job_posting.get('company', 'N/A')}
-Description: {job_posting.get('description', 'N/A')}
-Required Skills: {', '.join(job_posting.get('skills', []))}"""
-
-        structured_profile = f"""STRUCTURED PROFILE:
-Name: {user_profile.get('name', 'N/A')}
-Email: {user_profile.get('email', 'N/A')}
-Phone: {user_profile.get('phone', 'N/A')}
-Location: {user_profile.get('location', 'N/A')}
-LinkedIn: {user_profile.get('linkedin', 'N/A')}
-Portfolio: {user_profile.get('portfolio', 'N/A')}
-Summary: {user_profile.get('summary', 'N/A')}
-Experience: {user_profile.get('experience', 'N/A')}
-Education: {user_profile.get('education', 'N/A')}
-Skills: {user_profile.get('skills', 'N/A')}
-Certifications: {user_profile.get('certifications', 'N/A')}"""
-
         raw_resume_section = ""
         if raw_resume_text:
             raw_resume_section = f"\n\nORIGINAL RESUME TEXT (for reference and context):\n{raw_resume_text[:3000]}"
-
-        prompt = f"""{system_instructions}
-
-{job_description}
-
-{structured_profile}{raw_resume_section}
-
-INSTRUCTIONS:
-1. Analyze the job posting requirements and identify key skills, technologies, and qualifications needed
-2. Tailor the user's profile to match the job description by:
-   - Rewriting the summary to emphasize relevant experience
-   - Highlighting skills that match the job requirements
-   - Rewriting experience bullet points to emphasize relevant achievements
-   - Using keywords from the job description for ATS optimization
-3. Focus on achievements and measurable results
-4. Maintain accuracy - only use information from the provided profile
-
-Return your response as a JSON object with this exact structure:
-{{
-  "header": {{
-    "name": "Full Name",
-    "title": "Professional Title (tailored to job)",
-    "email": "email@example.com",
-    "phone": "phone number",
-    "location": "City, State/Country",
-    "linkedin": "LinkedIn URL or empty string",
-    "portfolio": "Portfolio URL or empty string"
-  }},
-  "summary": "2-3 sentence professional summary tailored to the job description, emphasizing relevant experience and skills",
-  "skills_highlighted": ["Skill 1", "Skill 2", "Skill 3", ...],
-  "experience": [
-    {{
-      "company": "Company Name",
-      "title": "Job Title",
-      "dates": "Date Range",
-      "bullets": [
-        "Rewritten bullet point emphasizing relevant achievement...",
-        "Another tailored bullet point..."
-      ]
-    }}
-  ],
-  "education": "Education details formatted as text",
-  "certifications": "Certifications, awards, or other achievements formatted as text"
-}}
-
-IMPORTANT: Return ONLY the JSON object, no markdown code blocks, no additional text."""
+        
+        return template.substitute(
+            job_description=job_description,
+            structured_profile=structured_profile,
+            raw_resume_section=raw_resume_section
+        )
+    
+    def _read_stream(self, response, messages, on_text=None):
+        """Accumulate a streamed (server-sent events) chat completion into its full text.
+        on_text, if given, is called with the partial text at most every PROGRESS_UPDATE_INTERVAL seconds."""
+        parts = []
+        usage = None
+        last_update = time.time()
+        with response:
+            for line in response.iter_lines():
+                if not line.startswith(b'data: '):
+                    continue
+                data = line[6:].strip()
+                if data == b'[DONE]':
+                    break
+                chunk = _json_loads(data)
+                usage = chunk.get('usage') or usage
+                # Azure sends a content-filter chunk with no choices first
+                for choice in chunk.get('choices') or ():
+                    delta = (choice.get('delta') or {}).get('content')
+                    if delta:
+                        parts.append(delta)
+                if on_text and parts and time.time() - last_update >= PROGRESS_UPDATE_INTERVAL:
+                    on_text(''.join(parts))
+                    last_update = time.time()
+        content = ''.join(parts)
+        
+        if self.token_tracker:
+            # Streamed responses on this API version carry no usage block; estimate locally
+            if usage:
+                prompt_tokens = usage.get('prompt_tokens', 0)
+                completion_tokens = usage.get('completion_tokens', 0)
+            else:
+                prompt_tokens = sum(_estimate_tokens(m['content']) for m in messages)
+                completion_tokens = _estimate_tokens(content)
+            self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+        return content
+    
+    def _request_resume_json(self, prompt, max_tokens, on_text=None):
+        """Send a resume prompt and return the parsed JSON object, or None on failure.
+        The reply is streamed; on_text receives the partial JSON text as it arrives."""
+        from .helpers import _websocket_keepalive, api_call_with_retry
         
         try:
             payload = {
                 "messages": [
-                    {"role": "system", "content": system_instructions},
+                    {"role": "system", "content": _RESUME_SYSTEM_INSTRUCTIONS},
                     {"role": "user", "content": prompt}
                 ],
-                "max_tokens": 3000,
+                "max_tokens": max_tokens,
                 "temperature": 0.7,
-                "response_format": {"type": "json_object"}
+                "response_format": {"type": "json_object"},
+                "stream": True
             }
             
             _websocket_keepalive("Generating resume...")
             
             def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=45)
+                return self.session.post(self.url, json=payload, timeout=45, stream=True)
             
-            response = api_call_with_retry(make_request, max_retries=3)
+            response = api_call_with_retry(make_request, max_retries=3, breaker=self.breaker)
             
             if response and response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                if self.token_tracker and 'usage' in result:
-                    usage = result['usage']
-                    prompt_tokens = usage.get('prompt_tokens', 0)
-                    completion_tokens = usage.get('completion_tokens', 0)
-                    self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+                content = self._read_stream(response, payload["messages"], on_text)
                 
                 try:
-                    content = content.strip()
-                    if content.startswith("```"):
-                        lines = content.split('\n')
-                        content = '\n'.join(lines[1:-1]) if lines[-1].startswith('```') else '\n'.join(lines[1:])
-                    
-                    resume_data = json.loads(content)
-                    return resume_data
+                    return _parse_llm_json(content)
                 except json.JSONDecodeError as e:
-                    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                    if json_match:
-                        resume_data = json.loads(json_match.group())
-                        return resume_data
-                    else:
-                        st.error(f"Could not parse JSON response: {e}")
-                        return None
+                    st.error(f"Could not parse JSON response: {e}")
+                    return None
             else:
                 if response:
                     error_detail = response.text[:200] if response.text else "No error details"
@@ -301,75 +698,92 @@ IMPORTANT: Return ONLY the JSON object, no markdown code blocks, no additional t
             st.error(f"Error generating resume: {e}")
             return None
     
-    def calculate_match_score(self, resume_content, job_description, embedding_generator):
+    def generate_resume(self, user_profile, job_posting, raw_resume_text=None, on_text=None):
+        """Generate a tailored resume based on user profile and job posting using Context Sandwich approach.
+        Returns structured JSON data instead of formatted text."""
+        prompt = self._build_resume_prompt(user_profile, job_posting, raw_resume_text, _RESUME_PROMPT)
+        return self._request_resume_json(prompt, max_tokens=3000, on_text=on_text)
+    
+    def analyze_job_bundle(self, user_profile, job_posting, raw_resume_text=None, on_text=None):
+        """Generate the tailored resume and extract the job's keywords in a single completion.
+        
+        Returns {"resume": {...}, "keywords": [...]} or None on failure. This
+        replaces a generate_resume call followed by calculate_match_score's
+        keyword request, so the job description is sent and billed once.
+        """
+        prompt = self._build_resume_prompt(user_profile, job_posting, raw_resume_text, _JOB_BUNDLE_PROMPT)
+        bundle = self._request_resume_json(prompt, max_tokens=3500, on_text=on_text)
+        if not isinstance(bundle, dict) or not isinstance(bundle.get('resume'), dict):
+            return None
+        keywords = bundle.get('keywords')
+        bundle['keywords'] = [k for k in keywords if isinstance(k, str)] if isinstance(keywords, list) else []
+        return bundle
+    
+    def calculate_match_score(self, resume_content, job_description, embedding_generator, job_keywords=None):
         """Calculate match score between resume and job description, and identify missing keywords.
+        Pass job_keywords (e.g. from analyze_job_bundle) to skip the keyword extraction request.
         Returns (None, None) if embeddings cannot be generated."""
         from .helpers import api_call_with_retry
         
         try:
-            resume_embedding, resume_tokens = embedding_generator.get_embedding(resume_content)
-            job_embedding, job_tokens = embedding_generator.get_embedding(job_description)
+            # Both texts go in one embeddings request; cached ones are not resent
+            (resume_embedding, job_embedding), embedding_tokens = embedding_generator.embed_texts(
+                [resume_content, job_description]
+            )
             
             # Token tracker is accessed via session state to avoid circular import
             if 'token_tracker' in st.session_state:
-                st.session_state.token_tracker.add_embedding_tokens(resume_tokens + job_tokens)
+                st.session_state.token_tracker.add_embedding_tokens(embedding_tokens)
             
-            if not resume_embedding or not job_embedding:
+            if resume_embedding is None or job_embedding is None:
                 return None, None
             
-            resume_emb = np.array(resume_embedding).reshape(1, -1)
-            job_emb = np.array(job_embedding).reshape(1, -1)
-            similarity = cosine_similarity(resume_emb, job_emb)[0][0]
-            match_score = float(similarity)
+            # Embeddings are unit vectors, so cosine similarity is a single dot product
+            match_score = float(np.dot(
+                np.asarray(resume_embedding, dtype=np.float32),
+                np.asarray(job_embedding, dtype=np.float32)
+            ))
             
-            job_desc_for_keywords = job_description[:8000] if len(job_description) > 8000 else job_description
-            if len(job_description) > 8000:
-                job_desc_for_keywords += "\n\n[Description truncated for keyword extraction - full description available for matching]"
-            
-            keyword_prompt = f"""Extract the most important technical skills, tools, technologies, and qualifications mentioned in this job description. 
-Return ONLY a JSON object with a "keywords" array, no additional text.
-
-Job Description:
-{job_desc_for_keywords}
-
-Return format: {{"keywords": ["keyword1", "keyword2", "keyword3", ...]}}"""
-            
-            payload = {
-                "messages": [
-                    {"role": "system", "content": "You are a keyword extraction expert. Extract only the most important technical and professional keywords. Return JSON with a 'keywords' array."},
-                    {"role": "user", "content": keyword_prompt}
-                ],
-                "max_tokens": 500,
-                "temperature": 0.3,
-                "response_format": {"type": "json_object"}
-            }
-            
-            def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-            
-            response = api_call_with_retry(make_request, max_retries=2)
-            
-            missing_keywords = []
-            if response and response.status_code == 200:
-                try:
-                    result = response.json()
-                    content = result['choices'][0]['message']['content']
-                    
-                    if self.token_tracker and 'usage' in result:
-                        usage = result['usage']
-                        prompt_tokens = usage.get('prompt_tokens', 0)
-                        completion_tokens = usage.get('completion_tokens', 0)
-                        self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
-                    
-                    keyword_data = json.loads(content)
-                    job_keywords = keyword_data.get('keywords', [])
-                    
-                    resume_lower = resume_content.lower()
-                    for keyword in job_keywords:
-                        if isinstance(keyword, str) and keyword.lower() not in resume_lower:
-                            missing_keywords.append(keyword)
-                except Exception as e:
-                    pass
+            if job_keywords is None:
+                job_desc_for_keywords = job_description[:8000] if len(job_description) > 8000 else job_description
+                if len(job_description) > 8000:
+                    job_desc_for_keywords += "\n\n[Description truncated for keyword extraction - full description available for matching]"
+                
+                keyword_prompt = _KEYWORD_PROMPT.substitute(job_description=job_desc_for_keywords)
+                
+                payload = {
+                    "messages": [
+                        {"role": "system", "content": "You are a keyword extraction expert. Extract only the most important technical and professional keywords. Return JSON with a 'keywords' array."},
+                        {"role": "user", "content": keyword_prompt}
+                    ],
+                    "max_tokens": 500,
+                    "temperature": 0.3,
+                    "response_format": {"type": "json_object"}
+                }
+                
+                def make_request():
+                    return self.session.post(self.url, json=payload, timeout=30)
+                
+                response = api_call_with_retry(make_request, max_retries=2, breaker=self.breaker)
+                
+                job_keywords = []
+                if response and response.status_code == 200:
+                    try:
+                        result = _json_loads(response.content)
+                        content = result['choices'][0]['message']['content']
+                        
+                        if self.token_tracker and 'usage' in result:
+                            usage = result['usage']
+                            prompt_tokens = usage.get('prompt_tokens', 0)
+                            completion_tokens = usage.get('completion_tokens', 0)
+                            self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+                        
+                        keyword_data = _json_loads(content)
+                        job_keywords = keyword_data.get('keywords', [])
+                    except Exception as e:
+                        pass
+                
+            missing_keywords = _missing_keywords(resume_content, job_keywords)
             
             return match_score, missing_keywords[:10]
             
@@ -377,26 +791,50 @@ Return format: {{"keywords": ["keyword1", "keyword2", "keyword3", ...]}}"""
             st.warning(f"Could not calculate match score: {e}")
             return None, None
     
-    def analyze_seniority_level(self, job_titles):
-        """Analyze job titles to determine seniority level"""
+    def _cached_chat_content(self, payload, on_text=None):
+        """Return the completion text for payload, reusing the reply to an identical earlier request.
+        Passing on_text streams the reply and reports the partial text as it arrives.
+        Returns None if the request fails; failures are not cached."""
         from .helpers import api_call_with_retry
         
+        key = _text_key(json.dumps(payload, sort_keys=True))
+        with self._completion_cache_lock:
+            cached = self._completion_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        stream = on_text is not None
+        request_payload = dict(payload, stream=True) if stream else payload
+        
+        def make_request():
+            return self.session.post(self.url, json=request_payload, timeout=30, stream=stream)
+        
+        response = api_call_with_retry(make_request, max_retries=2, breaker=self.breaker)
+        if not (response and response.status_code == 200):
+            return None
+        if stream:
+            content = self._read_stream(response, payload["messages"], on_text)
+        else:
+            result = _json_loads(response.content)
+            content = result['choices'][0]['message']['content']
+            
+            if self.token_tracker and 'usage' in result:
+                usage = result['usage']
+                prompt_tokens = usage.get('prompt_tokens', 0)
+                completion_tokens = usage.get('completion_tokens', 0)
+                self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
+        
+        with self._completion_cache_lock:
+            _bounded_put(self._completion_cache, key, content, COMPLETION_CACHE_MAX_ENTRIES)
+        return content
+    
+    def analyze_seniority_level(self, job_titles):
+        """Analyze job titles to determine seniority level"""
         if not job_titles:
             return "Mid-Senior Level"
         
         titles_text = "\n".join([f"- {title}" for title in job_titles[:10]])
-        prompt = f"""Analyze these job titles and determine the most common seniority level.
-        
-Job Titles:
-{titles_text}
-
-Return ONLY a JSON object with this structure:
-{{
-    "seniority": "Entry Level" | "Mid Level" | "Mid-Senior Level" | "Senior Level" | "Executive Level",
-    "confidence": "high" | "medium" | "low"
-}}
-
-Choose the most appropriate seniority level based on the job titles."""
+        prompt = _SENIORITY_PROMPT.substitute(titles=titles_text)
         
         try:
             payload = {
@@ -409,62 +847,33 @@ Choose the most appropriate seniority level based on the job titles."""
                 "response_format": {"type": "json_object"}
             }
             
-            def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-            
-            response = api_call_with_retry(make_request, max_retries=2)
-            if response and response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                if self.token_tracker and 'usage' in result:
-                    usage = result['usage']
-                    prompt_tokens = usage.get('prompt_tokens', 0)
-                    completion_tokens = usage.get('completion_tokens', 0)
-                    self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
-                
-                data = json.loads(content)
+            content = self._cached_chat_content(payload)
+            if content is not None:
+                data = _json_loads(content)
                 return data.get('seniority', 'Mid-Senior Level')
-        except:
+        except _CHAT_ERRORS:
             pass
         
         all_titles = " ".join(job_titles).lower()
-        if any(word in all_titles for word in ['executive', 'director', 'vp', 'vice president', 'head of']):
+        title_words = set(_TITLE_WORD_RE.findall(all_titles))
+        if title_words & _EXECUTIVE_TITLE_WORDS or any(phrase in all_titles for phrase in _EXECUTIVE_TITLE_PHRASES):
             return "Executive Level"
-        elif any(word in all_titles for word in ['senior', 'sr.', 'lead', 'principal']):
+        elif title_words & _SENIOR_TITLE_WORDS:
             return "Senior Level"
-        elif any(word in all_titles for word in ['junior', 'jr.', 'entry', 'associate', 'graduate']):
+        elif title_words & _ENTRY_TITLE_WORDS:
             return "Entry Level"
         else:
             return "Mid-Senior Level"
     
     def recommend_accreditations(self, job_descriptions, user_skills):
         """Recommend accreditations based on job requirements"""
-        from .helpers import api_call_with_retry
-        
         if not job_descriptions:
             return "PMP or Scrum Master"
         
         combined_desc = "\n\n".join([desc[:1000] for desc in job_descriptions[:5]])
         user_skills_str = user_skills if user_skills else "Not specified"
         
-        prompt = f"""Analyze these job descriptions and recommend the most valuable professional accreditation or certification for Hong Kong market.
-
-Job Descriptions:
-{combined_desc}
-
-User's Current Skills: {user_skills_str}
-
-Return ONLY a JSON object:
-{{
-    "accreditation": "Name of certification (e.g., PMP, HKICPA, AWS Certified)",
-    "reason": "Brief reason why this certification is valuable"
-}}
-
-Focus on certifications that are:
-1. Highly valued in Hong Kong market
-2. Frequently mentioned in these job descriptions
-3. Would unlock more opportunities for the user"""
+        prompt = _ACCREDITATION_PROMPT.substitute(job_descriptions=combined_desc, user_skills=user_skills_str)
         
         try:
             payload = {
@@ -477,54 +886,31 @@ Focus on certifications that are:
                 "response_format": {"type": "json_object"}
             }
             
-            def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-            
-            response = api_call_with_retry(make_request, max_retries=2)
-            if response and response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                
-                if self.token_tracker and 'usage' in result:
-                    usage = result['usage']
-                    prompt_tokens = usage.get('prompt_tokens', 0)
-                    completion_tokens = usage.get('completion_tokens', 0)
-                    self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
-                
-                data = json.loads(content)
+            content = self._cached_chat_content(payload)
+            if content is not None:
+                data = _json_loads(content)
                 return data.get('accreditation', 'PMP or Scrum Master')
-        except:
+        except _CHAT_ERRORS:
             pass
         
         return "PMP or Scrum Master"
     
-    def generate_recruiter_note(self, job, user_profile, semantic_score, skill_score):
-        """Generate a personalized recruiter note"""
-        from .helpers import api_call_with_retry
-        
+    def generate_recruiter_note(self, job, user_profile, semantic_score, skill_score, on_text=None):
+        """Generate a personalized recruiter note.
+        on_text, if given, receives the partial note while it is streamed."""
         job_title = job.get('title', '')
         job_desc = job.get('description', '')[:2000]
         user_summary = user_profile.get('summary', '')[:500]
         user_experience = user_profile.get('experience', '')[:500]
         
-        prompt = f"""You are a professional recruiter in Hong Kong. Write a brief, actionable note about why this candidate is a good fit for this role.
-
-Job Title: {job_title}
-Job Description (excerpt): {job_desc}
-
-Candidate Summary: {user_summary}
-Candidate Experience (excerpt): {user_experience}
-
-Match Scores:
-- Semantic Match: {semantic_score:.0%}
-- Skill Match: {skill_score:.0%}
-
-Write a 2-3 sentence recruiter note that:
-1. Highlights the strongest match points
-2. Mentions any specific experience or skills that align well
-3. Provides actionable feedback
-
-Return ONLY the recruiter note text, no labels or formatting."""
+        prompt = _RECRUITER_NOTE_PROMPT.substitute(
+            job_title=job_title,
+            job_desc=job_desc,
+            user_summary=user_summary,
+            user_experience=user_experience,
+            semantic_score=f"{semantic_score:.0%}",
+            skill_score=f"{skill_score:.0%}"
+        )
         
         try:
             payload = {
@@ -536,21 +922,10 @@ Return ONLY the recruiter note text, no labels or formatting."""
                 "temperature": 0.7
             }
             
-            def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=30)
-            
-            response = api_call_with_retry(make_request, max_retries=2)
-            if response and response.status_code == 200:
-                result = response.json()
-                
-                if self.token_tracker and 'usage' in result:
-                    usage = result['usage']
-                    prompt_tokens = usage.get('prompt_tokens', 0)
-                    completion_tokens = usage.get('completion_tokens', 0)
-                    self.token_tracker.add_completion_tokens(prompt_tokens, completion_tokens)
-                
-                return result['choices'][0]['message']['content'].strip()
-        except:
+            content = self._cached_chat_content(payload, on_text=on_text)
+            if content is not None:
+                return content.strip()
+        except _CHAT_ERRORS:
             pass
         
         if semantic_score >= 0.7:
@@ -597,6 +972,56 @@ class RateLimiter:
         self.request_times.append(time.time())
 
 
+class TokenBucket:
+    """Thread-safe token bucket for pacing calls against a rate quota.
+    
+    consume() reserves capacity immediately and returns how many seconds the
+    caller must wait before using it, so concurrent callers queue up behind
+    each other instead of all firing at once.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def per_minute(cls, limit):
+        """Bucket refilling at limit/60 per second with a 10-second burst allowance."""
+        return cls(rate=limit / 60.0, capacity=max(1.0, limit / 6.0))
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def consume(self, n):
+        """Reserve n tokens and return the seconds to wait until they are available."""
+        with self.lock:
+            self._refill()
+            # A single request larger than the bucket only waits for a full bucket
+            self.tokens -= min(n, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+    
+    def penalize(self, seconds=1.0):
+        """Remove `seconds` worth of capacity after the server reports a rate limit."""
+        with self.lock:
+            self._refill()
+            self.tokens -= self.rate * seconds
+
+
+def _job_dedup_key(job):
+    """Normalized (title, company, location) identifying the same posting across results."""
+    return (
+        str(job.get('title', '')).strip().lower(),
+        str(job.get('company', '')).strip().lower(),
+        str(job.get('location', '')).strip().lower()
+    )
+
+
 class IndeedScraperAPI:
     """Job scraper using Indeed Scraper API via RapidAPI."""
     def __init__(self, api_key):
@@ -607,6 +1032,8 @@ class IndeedScraperAPI:
             'x-rapidapi-host': 'indeed-scraper-api.p.rapidapi.com',
             'x-rapidapi-key': api_key
         }
+        self.session = _build_session(self.headers)
+        self.breaker = circuit_breaker_for(self.url)
         self.rate_limiter = RateLimiter(RAPIDAPI_MAX_REQUESTS_PER_MINUTE)
     
     def search_jobs(self, query, location="Hong Kong", max_rows=15, job_type="fulltime", country="hk"):
@@ -636,21 +1063,24 @@ class IndeedScraperAPI:
             _websocket_keepalive("Searching jobs...")
             
             def make_request():
-                return requests.post(self.url, headers=self.headers, json=payload, timeout=60)
+                return self.session.post(self.url, json=payload, timeout=60)
             
-            response = api_call_with_retry(make_request, max_retries=3, initial_delay=3)
+            response = api_call_with_retry(make_request, max_retries=3, initial_delay=3, breaker=self.breaker)
             
             # Keepalive after API response
             _ensure_websocket_alive()
             
             if response and response.status_code == 201:
-                data = response.json()
+                data = _json_loads(response.content)
                 jobs = []
                 
                 _websocket_keepalive("Processing job results...")
                 
                 if 'returnvalue' in data and 'data' in data['returnvalue']:
                     job_list = data['returnvalue']['data']
+                    # The scraper can return the same posting more than once (reposts,
+                    # sponsored duplicates); keep the first copy of each
+                    seen = set()
                     
                     for idx, job_data in enumerate(job_list):
                         # Keepalive every 5 jobs during parsing
@@ -658,7 +1088,10 @@ class IndeedScraperAPI:
                             _ensure_websocket_alive()
                         parsed_job = self._parse_job(job_data)
                         if parsed_job:
-                            jobs.append(parsed_job)
+                            key = _job_dedup_key(parsed_job)
+                            if key not in seen:
+                                seen.add(key)
+                                jobs.append(parsed_job)
                 
                 _websocket_keepalive("Job search complete", force=True)
                 return jobs
@@ -792,16 +1225,24 @@ def get_embedding_generator():
 
 
 def get_text_generator():
-    """Get cached text generator instance."""
+    """Get cached text generator instance.
+    
+    The instance is remembered in session state, like the job scraper, so
+    repeated calls skip the secrets lookups and cache_resource key hashing.
+    """
     try:
-        AZURE_OPENAI_API_KEY = st.secrets.get("AZURE_OPENAI_API_KEY")
-        AZURE_OPENAI_ENDPOINT = st.secrets.get("AZURE_OPENAI_ENDPOINT")
-        
-        if not AZURE_OPENAI_API_KEY or not AZURE_OPENAI_ENDPOINT:
-            st.error("⚠️ Azure OpenAI credentials are missing.")
-            return None
-        
-        generator = _create_text_generator_resource(AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT)
+        generator = st.session_state.get('text_generator')
+        if generator is None:
+            AZURE_OPENAI_API_KEY = st.secrets.get("AZURE_OPENAI_API_KEY")
+            AZURE_OPENAI_ENDPOINT = st.secrets.get("AZURE_OPENAI_ENDPOINT")
+            
+            if not AZURE_OPENAI_API_KEY or not AZURE_OPENAI_ENDPOINT:
+                st.error("⚠️ Azure OpenAI credentials are missing.")
+                return None
+            
+            generator = _create_text_generator_resource(AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT)
+            st.session_state.text_generator = generator
+        # The generator is shared across sessions; point it at this session's tracker
         generator.token_tracker = get_token_tracker()
         return generator
     except KeyError as e:
@@ -50,9 +50,18 @@ def _get_config_float(key, default, minimum=0.0):
 DEFAULT_EMBEDDING_BATCH_SIZE = _get_config_int("EMBEDDING_BATCH_SIZE", 15, minimum=5)
 DEFAULT_MAX_JOBS_TO_INDEX = _get_config_int("MAX_JOBS_TO_INDEX", 25, minimum=10)
 EMBEDDING_BATCH_DELAY = _get_config_float("EMBEDDING_BATCH_DELAY", 0.5, minimum=0.0)
+EMBEDDING_MAX_CONCURRENCY = _get_config_int("EMBEDDING_MAX_CONCURRENCY", 4, minimum=1)
+EMBEDDING_REQUESTS_PER_MINUTE = _get_config_int("EMBEDDING_REQUESTS_PER_MINUTE", 300, minimum=1)
+EMBEDDING_TOKENS_PER_MINUTE = _get_config_int("EMBEDDING_TOKENS_PER_MINUTE", 100000, minimum=1000)
+ANN_SEARCH_MIN_JOBS = _get_config_int("ANN_SEARCH_MIN_JOBS", 500, minimum=1)
 RAPIDAPI_MAX_REQUESTS_PER_MINUTE = _get_config_int("RAPIDAPI_MAX_REQUESTS_PER_MINUTE", 3, minimum=1)
 ENABLE_PROFILE_PASS2 = os.getenv("ENABLE_PROFILE_PASS2", "false").lower() in ("true", "1", "yes")
+# With pass 2 enabled, only run it for first-pass profiles that fail a local sanity check
+PROFILE_PASS2_ON_DEMAND = os.getenv("PROFILE_PASS2_ON_DEMAND", "true").lower() in ("true", "1", "yes")
 USE_FAST_SKILL_MATCHING = os.getenv("USE_FAST_SKILL_MATCHING", "true").lower() in ("true", "1", "yes")
+EXACT_TOKENS = os.getenv("EXACT_TOKENS", "false").lower() in ("true", "1", "yes")
+# Keep job embeddings in an on-disk Chroma store across restarts instead of in memory
+PERSIST_VECTOR_STORE = os.getenv("PERSIST_VECTOR_STORE", "false").lower() in ("true", "1", "yes")
 
 
 def _determine_index_limit(total_jobs, desired_top_matches):
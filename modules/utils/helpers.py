@@ -8,8 +8,11 @@ import re
 import base64
 import threading
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import requests
 
 # WebSocket keepalive configuration
@@ -66,6 +69,8 @@ def _parse_retry_after_value(value):
     value = value.strip()
     if not value:
         return None
+    if value.isascii() and value.isdigit():
+        return int(value)
     try:
         seconds = float(value)
         if seconds >= 0:
@@ -94,26 +99,33 @@ def _parse_retry_after_value(value):
     return None
 
 
+_BODY_SCAN_LIMIT = 1024
+_RETRY_AFTER_BODY_RE = re.compile(r'after\s+(\d+)\s+seconds?', re.IGNORECASE)
+
+
 def _extract_delay_from_body(response):
     """Attempt to read retry hints from JSON/text error bodies."""
     if response is None:
         return None
     message = None
-    try:
-        data = response.json()
-        if isinstance(data, dict):
-            error = data.get('error') or {}
-            if isinstance(error, dict):
-                message = error.get('message') or error.get('code')
-            if not message:
-                message = data.get('message')
-    except (ValueError, json.JSONDecodeError):
-        pass
+    content_type = (response.headers or {}).get('Content-Type', '')
+    if content_type.startswith('application/json'):
+        try:
+            data = response.json()
+            if isinstance(data, dict):
+                error = data.get('error') or {}
+                if isinstance(error, dict):
+                    message = error.get('message') or error.get('code')
+                if not message:
+                    message = data.get('message')
+        except (ValueError, json.JSONDecodeError):
+            pass
     if not message:
-        message = response.text or ""
+        # Gateway error pages can be large HTML documents; only scan the head
+        message = (response.text or "")[:_BODY_SCAN_LIMIT]
     if not message:
         return None
-    match = re.search(r'after\s+(\d+)\s+seconds?', message, re.IGNORECASE)
+    match = _RETRY_AFTER_BODY_RE.search(message)
     if match:
         try:
             seconds = int(match.group(1))
@@ -124,23 +136,34 @@ def _extract_delay_from_body(response):
     return None
 
 
+# Retry hint headers in priority order (lowercase; matched case-insensitively)
+_RETRY_HEADERS = (
+    'retry-after',
+    'x-ms-retry-after-ms',
+    'x-ms-retry-after',
+    'x-ratelimit-reset-requests',
+    'x-ratelimit-reset-tokens',
+    'x-ratelimit-reset',
+)
+
+
 def _determine_retry_delay(response, fallback_delay, max_delay):
     """Use headers/body hints to determine how long to wait before retrying."""
     if response is not None:
-        headers = response.headers or {}
-        header_candidates = [
-            'Retry-After',
-            'x-ms-retry-after-ms',
-            'x-ms-retry-after',
-            'x-ratelimit-reset-requests',
-            'x-ratelimit-reset-tokens',
-            'x-ratelimit-reset',
-        ]
-        for header in header_candidates:
+        headers = {k.lower(): v for k, v in (response.headers or {}).items()}
+        for header in _RETRY_HEADERS:
             raw_value = headers.get(header)
             if not raw_value:
                 continue
             if header.endswith('-ms'):
+                try:
+                    ms_int = int(raw_value)
+                    if ms_int >= 0:
+                        seconds = (ms_int + 999) // 1000
+                        return max(1, min(seconds, max_delay)), f"header:{header}"
+                    continue
+                except (ValueError, TypeError):
+                    pass
                 try:
                     ms = float(raw_value)
                     if ms >= 0:
@@ -309,29 +332,182 @@ class ProgressTracker:
         _websocket_keepalive()
 
 
-def api_call_with_retry(func, max_retries=3, initial_delay=1, max_delay=60):
-    """Execute an API call with exponential backoff retry logic for rate limit errors (429)."""
-    for attempt in range(max_retries):
+def _script_ctx_executor(max_workers):
+    """Create a thread pool whose workers may call Streamlit APIs for the current session.
+    
+    Streamlit only renders st.* calls made from threads carrying the script run
+    context, so the caller's context is attached to every worker on startup.
+    """
+    ctx = get_script_run_ctx()
+    
+    def _attach_ctx():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=_attach_ctx)
+
+
+def _submit_in_background(fn, *args, **kwargs):
+    """Start fn(*args, **kwargs) on its own worker thread and return its Future.
+    
+    The worker carries the script run context, and the caller does not wait
+    for it: the script continues and collects the result when it needs it.
+    """
+    executor = _script_ctx_executor(1)
+    future = executor.submit(fn, *args, **kwargs)
+    executor.shutdown(wait=False)
+    return future
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast against an endpoint that keeps failing.
+    
+    After failure_threshold consecutive failures (5xx responses, timeouts or
+    network errors) within failure_window seconds the breaker opens and calls
+    raise CircuitOpenError for cooldown seconds. It then goes half-open and lets
+    a single trial call through: success closes it, failure reopens it.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold=5, failure_window=60, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.first_failure_at = 0.0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.time() - self.opened_at < self.cooldown:
+                    raise CircuitOpenError(f"circuit open for another {self.cooldown - (time.time() - self.opened_at):.0f}s")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError("circuit half-open, trial call in progress")
+                self._trial_in_flight = True
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            now = time.time()
+            if self.state == self.HALF_OPEN:
+                self._open(now)
+                return
+            if self.failures == 0 or now - self.first_failure_at > self.failure_window:
+                self.failures = 0
+                self.first_failure_at = now
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._open(now)
+    
+    def _open(self, now):
+        self.state = self.OPEN
+        self.opened_at = now
+        self.failures = 0
+        self._trial_in_flight = False
+    
+    def __call__(self, func):
+        """Call func() under the breaker; 5xx responses and request exceptions count as failures."""
+        self.before_call()
         try:
             response = func()
+        except requests.exceptions.RequestException:
+            self.record_failure()
+            raise
+        except Exception:
+            # Not the endpoint's fault; release a half-open trial without judging it
+            with self._lock:
+                self._trial_in_flight = False
+            raise
+        if response is not None and response.status_code >= 500:
+            self.record_failure()
+        elif response is not None and response.status_code != 429:
+            self.record_success()
+        else:
+            with self._lock:
+                self._trial_in_flight = False
+        return response
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def circuit_breaker_for(url):
+    """Return the process-wide CircuitBreaker shared by every call to url's host."""
+    host = urlparse(url).netloc
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(host)
+        if breaker is None:
+            breaker = _circuit_breakers[host] = CircuitBreaker()
+        return breaker
+
+
+def api_call_with_retry(func, max_retries=3, initial_delay=1, max_delay=60, breaker=None, give_up=None):
+    """Execute an API call with exponential backoff retry logic for rate limit errors (429).
+    
+    Retry and failure messages are written into a single placeholder that is
+    overwritten in place, so a long rate-limited run shows one status line
+    instead of appending a new alert per attempt.
+    
+    When a CircuitBreaker is given, every attempt goes through it and the call
+    returns None straight away while the breaker is open, so callers drop to
+    their fallback paths instead of retrying against a failing endpoint.
+    
+    A 429 response for which give_up(response) is true is returned as is,
+    for rate limit errors that waiting will not fix.
+    """
+    status = None
+    
+    def _status():
+        nonlocal status
+        if status is None:
+            status = st.empty()
+        return status
+    
+    for attempt in range(max_retries):
+        try:
+            response = breaker(func) if breaker is not None else func()
             
             if response.status_code in [200, 201]:
+                if status is not None:
+                    status.empty()
                 return response
             
             elif response.status_code == 429:
+                if give_up is not None and give_up(response):
+                    if status is not None:
+                        status.empty()
+                    return response
                 if attempt < max_retries - 1:
                     fallback_delay = _calculate_exponential_delay(initial_delay, attempt, max_delay)
                     delay, delay_source = _determine_retry_delay(response, fallback_delay, max_delay)
                     source_note = ""
                     if delay_source != "fallback":
                         source_note = f" (server hint: {delay_source})"
-                    if attempt == 0:
-                        st.warning(
-                            f"⏳ Rate limit reached. Retrying in {delay} seconds{source_note}... "
-                            f"(Attempt {attempt + 1}/{max_retries})"
-                        )
-                    else:
-                        st.caption(f"⏳ Retrying... ({attempt + 1}/{max_retries})")
+                    _status().warning(
+                        f"⏳ Rate limit reached. Retrying in {delay} seconds{source_note}... "
+                        f"(Attempt {attempt + 1}/{max_retries})"
+                    )
                     _chunked_sleep(delay, f"⏳ Retry {attempt + 1}/{max_retries}")
                     continue
                 else:
@@ -343,34 +519,38 @@ def api_call_with_retry(func, max_retries=3, initial_delay=1, max_delay=60):
                         "3. Check your API quota/limits\n\n"
                         f"Status: {response.status_code}"
                     )
-                    st.error(error_msg)
+                    _status().error(error_msg)
                     return None
             
             else:
                 return response
                 
+        except CircuitOpenError:
+            _status().error("🔌 Service is failing repeatedly; skipping the request for now. Please try again shortly.")
+            return None
+        
         except requests.exceptions.Timeout:
             if attempt < max_retries - 1:
                 delay = _calculate_exponential_delay(initial_delay, attempt, max_delay)
-                st.warning(f"⏳ Request timed out. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
+                _status().warning(f"⏳ Request timed out. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
                 _chunked_sleep(delay)
                 continue
             else:
-                st.error("❌ Request timed out after multiple attempts. Please try again later.")
+                _status().error("❌ Request timed out after multiple attempts. Please try again later.")
                 return None
         
         except requests.exceptions.RequestException as e:
             if attempt < max_retries - 1:
                 delay = _calculate_exponential_delay(initial_delay, attempt, max_delay)
-                st.warning(f"⏳ Network error. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
+                _status().warning(f"⏳ Network error. Retrying in {delay} seconds... (Attempt {attempt + 1}/{max_retries})")
                 _chunked_sleep(delay)
                 continue
             else:
-                st.error(f"❌ Network error after multiple attempts: {e}")
+                _status().error(f"❌ Network error after multiple attempts: {e}")
                 return None
         
         except Exception as e:
-            st.error(f"❌ Unexpected error: {e}")
+            _status().error(f"❌ Unexpected error: {e}")
             return None
     
     return None
@@ -184,8 +184,95 @@ Format the resume in a clean, professional text format with clear sections."""
     
     return all_passed
 
+def test_circuit_breaker_transitions():
+    """Closed -> open -> half-open -> closed/open, driven by a fake clock"""
+    from modules.utils.helpers import CircuitBreaker, CircuitOpenError, circuit_breaker_for
+    
+    clock = [1000.0]
+    with patch('time.time', lambda: clock[0]):
+        breaker = CircuitBreaker(failure_threshold=2, failure_window=60, cooldown=30)
+        
+        # Failures further apart than the window never add up
+        breaker.record_failure()
+        clock[0] += 61
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        try:
+            breaker.before_call()
+            assert False, "open breaker let a call through"
+        except CircuitOpenError:
+            pass
+        
+        # After the cooldown exactly one trial call is allowed
+        clock[0] += 31
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            breaker.before_call()
+            assert False, "half-open breaker let a second call through"
+        except CircuitOpenError:
+            pass
+        
+        # A failed trial reopens it, a successful one closes it
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        clock[0] += 31
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+    
+    assert circuit_breaker_for("https://a.example.com/x") is circuit_breaker_for("https://a.example.com/y")
+    assert circuit_breaker_for("https://a.example.com/x") is not circuit_breaker_for("https://b.example.com/x")
+
+
+def test_token_bucket_pacing():
+    """TokenBucket waits, refill and burst cap, driven by a fake clock"""
+    from modules.utils.api_clients import TokenBucket
+    
+    clock = [0.0]
+    with patch('time.monotonic', lambda: clock[0]):
+        bucket = TokenBucket(rate=1.0, capacity=2.0)
+        assert bucket.consume(1) == 0.0
+        assert bucket.consume(1) == 0.0
+        # Empty: the next token arrives one second later
+        assert bucket.consume(1) == 1.0
+        
+        clock[0] += 3
+        assert bucket.consume(1) == 0.0
+        # A request larger than the bucket only waits for a full bucket
+        assert bucket.consume(10) == 1.0
+        
+        clock[0] += 10
+        bucket.penalize(2.0)
+        assert bucket.consume(1) == 1.0
+    
+    per_minute = TokenBucket.per_minute(60)
+    assert per_minute.rate == 1.0 and per_minute.capacity == 10.0
+
+
+def test_missing_keywords_matching():
+    """_missing_keywords: case-insensitive substring match, overlaps, regex characters"""
+    from modules.utils.api_clients import _missing_keywords
+    
+    assert _missing_keywords("Python and AWS", ["python", "Docker", "aws"]) == ["Docker"]
+    # Keywords that are prefixes or suffixes of a longer match are still found
+    assert _missing_keywords("JavaScript", ["Java", "JavaScript", "Script"]) == []
+    assert _missing_keywords("Reactive systems", ["React"]) == []
+    assert _missing_keywords("C++ developer", ["C++", "C#"]) == ["C#"]
+    # Non-strings are ignored; order and duplicates of the input are kept
+    assert _missing_keywords("", [None, "SQL", "sql"]) == ["SQL", "sql"]
+    assert _missing_keywords("anything", []) == []
+
+
 if __name__ == "__main__":
     try:
+        test_circuit_breaker_transitions()
+        test_token_bucket_pacing()
+        test_missing_keywords_matching()
         success = test_with_mock_api()
         sys.exit(0 if success else 1)
     except Exception as e: